@@ -4,3 +4,9 @@ class StitchMode(object):
     """
     Scroll = "Scroll"
     CSS = "CSS"
+    # Resizes the browser window to the size of the page and takes a single screenshot. Meant for
+    # headless browsers, where the window isn't limited by the screen. Falls back to scrolling.
+    Resize = "Resize"
+    # Measures the cost of scrolling, CSS translation and screenshots on the browser, and picks the
+    # mode expected to capture the page the fastest.
+    Auto = "Auto"
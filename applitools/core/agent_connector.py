@@ -120,14 +120,15 @@ class AgentConnector(object):
                            pr['layoutMatches'], pr['noneMatches'], pr['status'])
 
     def match_window(self, running_session, data):
-        # type: (RunningSession, tp.Text) -> bool
+        # type: (RunningSession, tp.Union[bytes, tp.Iterable[bytes]]) -> bool
         """
         Matches the current window to the immediate expected window in the Eyes server. Notice that
         a window might be matched later at the end of the test, even if it was not immediately
         matched in this call.
 
         :param running_session: The current session that is running.
-        :param data: The data for the requests.post.
+        :param data: The data for the requests.post. If an iterable of bytes chunks is given, the data is
+                     sent using chunked transfer encoding as the chunks become available.
         :return: The parsed response.
         """
         # logger.debug("Data length: %d, data: %s" % (len(data), repr(data)))
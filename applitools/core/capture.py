@@ -23,10 +23,50 @@ class EyesScreenshotBase(ABC):
     Base class for handling screenshots.
     """
 
-    def __init__(self, image):
-        # type: (Image.Image) -> None
+    def __init__(self, image, box=None):
+        # type: (Image.Image, tp.Optional[tp.Tuple[int, int, int, int]]) -> None
+        """
+        :param image: The screenshot's image, or the image the screenshot is a part of.
+        :param box: The (left, top, right, bottom) box of the screenshot in the image. If None, the
+            screenshot is the entire image. The box is copied out of the image only when its pixels
+            are needed.
+        """
         argument_guard.is_a(image, Image.Image)
-        self._screenshot = image
+        self._image = image
+        self._box = box
+        # The settings of the encoder used for the cached png bytes, and the bytes themselves.
+        self._encoded = None  # type: tp.Optional[tp.Tuple[tp.Tuple, bytes]]
+
+    @property
+    def _screenshot(self):
+        # type: () -> Image.Image
+        """
+        The screenshot's image (copied out of the image it's a part of, on first access).
+        """
+        if self._box is not None:
+            self._image = self._image.crop(self._box)
+            self._box = None
+        return self._image
+
+    @property
+    def _size(self):
+        # type: () -> tp.Tuple[int, int]
+        """
+        The width and height of the screenshot, without copying it.
+        """
+        if self._box is not None:
+            left, top, right, bottom = self._box
+            return right - left, bottom - top
+        return self._image.size
+
+    def _get_part_box(self, region):
+        # type: (Region) -> tp.Tuple[Image.Image, tp.Tuple[int, int, int, int]]
+        """
+        Returns the image and the box in it of the given region of the screenshot, so a sub screenshot
+        can share the image instead of copying the region.
+        """
+        left, top = self._box[:2] if self._box is not None else (0, 0)
+        return self._image, (left + region.left, top + region.top, left + region.right, top + region.bottom)
 
     @staticmethod
     @abc.abstractmethod
@@ -109,14 +149,37 @@ class EyesScreenshotBase(ABC):
             created.
         """
 
-    def get_bytes(self):
-        # type: () -> bytes
+    def get_bytes(self, encoder=None):
+        # type: (tp.Optional[image_utils.PngEncoder]) -> bytes
         """
-        Returns the bytes of the screenshot.
+        Returns the bytes of the screenshot. The screenshot is encoded only once per encoder settings.
 
+        :param encoder: The encoder to use. If None, the default encoder settings are used.
         :return: The bytes representation of the png.
         """
-        return image_utils.get_bytes(self._screenshot)
+        encoder = encoder or image_utils.PngEncoder()
+        if self._encoded is None or self._encoded[0] != encoder.settings:
+            self._encoded = (encoder.settings, encoder.encode(self._screenshot))
+        return self._encoded[1]
+
+    def iter_bytes(self, encoder=None):
+        # type: (tp.Optional[image_utils.PngEncoder]) -> tp.Iterator[bytes]
+        """
+        Returns the bytes of the screenshot in chunks, which are encoded as they are consumed
+        (unless the screenshot was already encoded).
+
+        :param encoder: The encoder whose settings are used. If None, the default settings are used.
+                        Its reduce_palette setting is ignored, since the colors can only be counted
+                        once the entire image was read, and the bands are encoded as they are read.
+        :return: An iterator over the bytes representation of the png.
+        """
+        encoder = encoder or image_utils.PngEncoder()
+        if self._encoded is not None and self._encoded[0] == encoder.settings:
+            return iter([self._encoded[1]])
+        # The bands are read straight from the image the screenshot is a part of.
+        filter_type = encoder.filter_type if encoder.filter_type is not None else image_utils.PngFilter.UP
+        return image_utils.iter_png_bytes(self._image, compress_level=encoder.compress_level,
+                                          filter_type=filter_type, box=self._box)
 
     def get_intersected_region_by_element(self, element):
         # type: (EyesWebElement) -> Region
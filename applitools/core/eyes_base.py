@@ -8,7 +8,7 @@ from datetime import datetime
 
 from ..__version__ import __version__
 from ..common import StitchMode
-from ..utils import general_utils, ABC
+from ..utils import general_utils, image_utils, ABC
 from . import logger
 from .agent_connector import AgentConnector
 from .match_window_task import MatchWindowTask
@@ -205,6 +205,14 @@ class EyesBase(ABC):
         # The number of milliseconds to wait before each time a screenshot is taken.
         self.wait_before_screenshots = EyesBase._DEFAULT_WAIT_BEFORE_SCREENSHOTS  # type: int
 
+        # If true, the screenshot is encoded while it is being uploaded (using chunked transfer encoding)
+        # instead of being fully encoded before the upload starts. The screenshot encoder's compression
+        # level and filter are used, but palette reduction isn't.
+        self.stream_screenshot_upload = False  # type: bool
+
+        # The encoder used for the screenshots sent to the server. See image_utils.PngEncoder.
+        self.screenshot_encoder = image_utils.PngEncoder()  # type: image_utils.PngEncoder
+
     @abc.abstractmethod
     def get_title(self):
         # type: () -> tp.Text
@@ -283,10 +291,10 @@ class EyesBase(ABC):
         """
         Sets the stitch property - default is by scrolling.
 
-        :param stitch_mode: The stitch mode to set - either scrolling or css.
+        :param stitch_mode: The stitch mode to set - either scrolling, css, resizing or auto.
         """
         self._stitch_mode = stitch_mode
-        if stitch_mode == StitchMode.CSS:
+        if stitch_mode in (StitchMode.CSS, StitchMode.Auto):
             self.hide_scrollbars = True
 
     @property
@@ -1,6 +1,7 @@
 from __future__ import absolute_import
 
 import functools
+import itertools
 import time
 import typing as tp
 from struct import pack
@@ -16,6 +17,7 @@ if tp.TYPE_CHECKING:
     from ..selenium.target import Target
     from ..utils.custom_types import (Num, RunningSession, AppOutput,
                                       UserInputs, MatchResult)
+    from ..utils.image_utils import PngEncoder
     from .agent_connector import AgentConnector
     from .eyes_base import ImageMatchSettings
     from .capture import EyesScreenshotBase
@@ -23,6 +25,26 @@ if tp.TYPE_CHECKING:
 __all__ = ('MatchWindowTask',)
 
 
+def _log_streamed_payload(chunks):
+    # type: (tp.Iterator[bytes]) -> tp.Iterator[bytes]
+    """
+    Passes the chunks of a screenshot which is encoded as it's uploaded, and logs its size and the
+    time spent encoding it (not including the time spent sending it) once it's done.
+    """
+    size = 0
+    encode_time = 0.0
+    chunks = iter(chunks)
+    while True:
+        start = time.time()
+        chunk = next(chunks, None)
+        encode_time += time.time() - start
+        if chunk is None:
+            break
+        size += len(chunk)
+        yield chunk
+    logger.info("Screenshot payload: {0} bytes (streamed, encoded in {1:.0f} ms)".format(size, encode_time * 1000))
+
+
 # TODO: remove Eyes and Target dependencies from here
 
 class MatchWindowTask(object):
@@ -59,8 +81,10 @@ class MatchWindowTask(object):
                                  target,  # type: Target
                                  ignore=None,  # type: tp.Optional[tp.List]
                                  floating=None,  # type: tp.Optional[tp.List]
+                                 stream=False,  # type: bool
+                                 encoder=None,  # type: tp.Optional[PngEncoder]
                                  ):
-        # type: (...) -> bytes
+        # type: (...) -> tp.Union[bytes, tp.Iterator[bytes]]
         if ignore is None:
             ignore = []
         if floating is None:
@@ -89,7 +113,14 @@ class MatchWindowTask(object):
         }
         match_data_json_bytes = general_utils.to_json(match_data).encode('utf-8')
         match_data_size_bytes = pack(">L", len(match_data_json_bytes))
-        screenshot_bytes = screenshot.get_bytes()
+        if stream:
+            # The screenshot is encoded band by band while the body is being sent.
+            return itertools.chain([match_data_size_bytes + match_data_json_bytes],
+                                   _log_streamed_payload(screenshot.iter_bytes(encoder)))
+        start = time.time()
+        screenshot_bytes = screenshot.get_bytes(encoder)
+        encode_time = (time.time() - start) * 1000
+        logger.info("Screenshot payload: {0} bytes (encoded in {1:.0f} ms)".format(len(screenshot_bytes), encode_time))
         body = match_data_size_bytes + match_data_json_bytes + screenshot_bytes
         return body
 
@@ -119,15 +150,53 @@ class MatchWindowTask(object):
                                        default_match_settings,  # type: ImageMatchSettings
                                        target,  # type: Target
                                        ignore_mismatch=False):
-        # type: (...) -> bytes
+        # type: (...) -> tp.Union[bytes, tp.Iterator[bytes]]
         title = self._eyes.get_title()
         with self._eyes.hide_scrollbars_if_needed():
             self._screenshot = self._eyes.get_screenshot(hide_scrollbars_called=True)
             dynamic_regions = MatchWindowTask._get_dynamic_regions(target, self._screenshot)
+        return self._prepare_match_data_for_screenshot(title, self._screenshot, dynamic_regions, tag, user_inputs,
+                                                       default_match_settings, target, ignore_mismatch)
+
+    def _prepare_match_data_for_screenshot(self, title,  # type: tp.Text
+                                           screenshot,  # type: EyesScreenshotBase
+                                           dynamic_regions,  # type: tp.Dict[tp.Text, tp.List]
+                                           tag,  # type: tp.Text
+                                           user_inputs,  # type: UserInputs
+                                           default_match_settings,  # type: ImageMatchSettings
+                                           target,  # type: Target
+                                           ignore_mismatch=False):
+        # type: (...) -> tp.Union[bytes, tp.Iterator[bytes]]
         app_output = {'title': title, 'screenshot64': None}  # type: AppOutput
         return self._create_match_data_bytes(app_output, user_inputs, tag, ignore_mismatch,
-                                             self._screenshot, default_match_settings, target,
-                                             dynamic_regions['ignore'], dynamic_regions['floating'])
+                                             screenshot, default_match_settings, target,
+                                             dynamic_regions['ignore'], dynamic_regions['floating'],
+                                             self._eyes.stream_screenshot_upload, self._eyes.screenshot_encoder)
+
+    def match_screenshot(self, screenshot,  # type: EyesScreenshotBase
+                         tag,  # type: tp.Text
+                         user_inputs,  # type: UserInputs
+                         default_match_settings,  # type: ImageMatchSettings
+                         target,  # type: Target
+                         ignore_mismatch=False):
+        # type: (...) -> MatchResult
+        """
+        Performs a single match of an already captured screenshot (without retrying).
+
+        :param screenshot: The screenshot to match.
+        :param tag: The name of the tag (optional).
+        :param user_inputs: The user input.
+        :param default_match_settings: The default match settings for the session.
+        :param target: The target of the check call.
+        :param ignore_mismatch: Whether a mismatch shouldn't be recorded as a step.
+        :return: The result of the match.
+        """
+        self._screenshot = screenshot
+        dynamic_regions = MatchWindowTask._get_dynamic_regions(target, screenshot)
+        data = self._prepare_match_data_for_screenshot(self._eyes.get_title(), screenshot, dynamic_regions, tag,
+                                                       user_inputs, default_match_settings, target, ignore_mismatch)
+        as_expected = self._agent_connector.match_window(self._running_session, data)
+        return {"as_expected": as_expected, "screenshot": screenshot}
 
     def _run_with_intervals(self, prepare_action, retry_timeout):
         # type: (tp.Callable, Num) -> MatchResult
@@ -36,12 +36,33 @@ class ContextBasedScaleProvider(ScaleProvider):
     _ALLOWED_DCES_DEVIATION = 10
 
     def __init__(self, top_level_context_entire_size, viewport_size,
-                 device_pixel_ratio, is_mobile_device):
+                 device_pixel_ratio, is_mobile_device, known_scale_ratios=None):
+        """
+        Ctor.
+
+        :param top_level_context_entire_size: The entire size of the top level context, or a function
+            returning it, which is only called if the size is needed for calculating the scale ratio.
+            None if it can't be read.
+        :param viewport_size: The viewport size.
+        :param device_pixel_ratio: The device pixel ratio.
+        :param is_mobile_device: Whether the browser runs on a mobile device.
+        :param known_scale_ratios: The scale ratios calculated so far for the same browser, viewport
+            size and device pixel ratio, by the width of the image they were calculated for. They're
+            reused for images of the same width, and updated with newly calculated ratios which
+            don't depend on the page's size.
+        """
         super(ContextBasedScaleProvider, self).__init__()
-        self.top_level_context_entire_size = top_level_context_entire_size
+        self._top_level_context_entire_size = top_level_context_entire_size
         self.viewport_size = viewport_size
         self.device_pixel_ratio = device_pixel_ratio
         self.is_mobile_device = is_mobile_device
+        self._known_scale_ratios = known_scale_ratios if known_scale_ratios is not None else {}
+
+    @property
+    def top_level_context_entire_size(self):
+        if callable(self._top_level_context_entire_size):
+            self._top_level_context_entire_size = self._top_level_context_entire_size()
+        return self._top_level_context_entire_size
 
     @property
     def scale_ratio(self):
@@ -54,25 +75,46 @@ class ContextBasedScaleProvider(ScaleProvider):
         return current_scale_ratio * from_scaled_to_viewport_ratio
 
     def update_scale_ratio(self, image_to_scale_width):
+        known_scale_ratio = self._known_scale_ratios.get(image_to_scale_width)
+        if known_scale_ratio is not None:
+            logger.debug("Reusing the scale ratio {} calculated for an image of the same width".format(
+                known_scale_ratio))
+            self._scale_ratio = known_scale_ratio
+            return
+
         viewport_width = self.viewport_size['width']
-        dces_width = self.top_level_context_entire_size['width']
 
         # If the image's width is the same as the viewport's width or the
-        # top level context's width, no scaling is necessary.
+        # top level context's width, no scaling is necessary. The top level context's size is only
+        # read when it's needed.
         allowed_vs_deviation = (viewport_width - self._ALLOWED_VS_DEVIATION <= image_to_scale_width
                                 <= viewport_width + self._ALLOWED_VS_DEVIATION)
-        allowed_dces_deviation = (dces_width - self._ALLOWED_DCES_DEVIATION <= image_to_scale_width
-                                  <= dces_width + self._ALLOWED_DCES_DEVIATION)
-        if allowed_dces_deviation or allowed_vs_deviation:
+        if allowed_vs_deviation:
             logger.info('Image is already scaled correctly.')
             self._scale_ratio = 1.0
+        elif self.top_level_context_entire_size is None:
+            # This can happen in Appium for example.
+            logger.info("Failed to get the top level context's size, so scaling by the device pixel ratio.")
+            self._scale_ratio = 1.0 / self.device_pixel_ratio
+            return
+        elif self._is_top_level_context_width(image_to_scale_width):
+            # This depends on the page, so it isn't kept for other images.
+            logger.info('Image is already scaled correctly.')
+            self._scale_ratio = 1.0
+            return
         else:
             logger.info('Calculating the scale ratio..')
             self._scale_ratio = 1.0 / self.device_pixel_ratio
             if self.is_mobile_device:
                 logger.info('Mobile device, so using 2 step calculation for scale ration...')
-                logger.info('Scale ratio based on DRP: ' + self._scale_ratio)
+                logger.info('Scale ratio based on DRP: {}'.format(self._scale_ratio))
                 self._scale_ratio = self.get_scale_ratio_to_viewport(viewport_width,
                                                                      image_to_scale_width,
                                                                      self._scale_ratio)
             logger.info("Final scale ratio: {}".format(self.scale_ratio))
+        self._known_scale_ratios[image_to_scale_width] = self._scale_ratio
+
+    def _is_top_level_context_width(self, image_to_scale_width):
+        dces_width = self.top_level_context_entire_size['width']
+        return (dces_width - self._ALLOWED_DCES_DEVIATION <= image_to_scale_width
+                <= dces_width + self._ALLOWED_DCES_DEVIATION)
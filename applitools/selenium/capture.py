@@ -6,14 +6,79 @@ import base64
 from selenium.common.exceptions import WebDriverException
 
 from ..core import EyesError, Point, Region, OutOfBoundsError, EyesScreenshotBase
-from ..utils import image_utils, eyes_selenium_utils
+from ..utils import cached_property, image_utils, eyes_selenium_utils, scripts
 
 if tp.TYPE_CHECKING:
     from PIL import Image
-    from ..utils.custom_types import ViewPort
+    from ..utils.custom_types import Num, ViewPort
     from .webdriver import EyesWebDriver
 
 
+class ScreenshotContext(object):
+    """
+    The state of the browser in which a screenshot was taken. It's read when the context is created (right
+    after the screenshot was taken, in a single round trip when possible), and it's shared by the screenshot
+    and its sub screenshots.
+    """
+    # The viewport size, scroll position and entire size of the page, in a single round trip.
+    _JS_GET_PAGE_METRICS = scripts.register('pageMetrics', """
+        var doc = document.documentElement;
+        var body = document.body;
+        var width = window.innerWidth || doc.clientWidth || body.clientWidth;
+        var height = window.innerHeight || doc.clientHeight || body.clientHeight;
+        var x = window.scrollX || ((window.pageXOffset || doc.scrollLeft) - (doc.clientLeft || 0));
+        var y = window.scrollY || ((window.pageYOffset || doc.scrollTop) - (doc.clientTop || 0));
+        var entireWidth = Math.max(doc.scrollWidth, body.scrollWidth);
+        var entireHeight = Math.max(doc.clientHeight, doc.scrollHeight, body.clientHeight, body.scrollHeight);
+        return [width, height, x, y, entireWidth, entireHeight];""")
+
+    def __init__(self, driver):
+        # type: (EyesWebDriver) -> None
+        self.frame_chain = driver.get_frame_chain()
+        page_metrics = self._get_page_metrics(driver)
+        if page_metrics:
+            width, height, x, y, entire_width, entire_height = page_metrics
+            # The viewport size of the most outer frame.
+            self.viewport_size = dict(width=int(round(width)), height=int(round(height)))  # type: ViewPort
+            # The size of the frame in which the screenshot was taken (or of the page).
+            self.frame_size = dict(width=int(round(entire_width)), height=int(round(entire_height)))  # type: ViewPort
+            # The scroll position of the frame in which the screenshot was taken.
+            self.scroll_position = Point(x, y)  # type: Point
+        else:
+            self.viewport_size = driver.get_default_content_viewport_size()
+            self.frame_size = self._get_frame_size(driver)
+            self.scroll_position = self._get_scroll_position(driver)
+
+    def _get_page_metrics(self, driver):
+        # type: (EyesWebDriver) -> tp.Optional[tp.List[Num]]
+        # Inside a frame, the viewport size is of the default content while the rest is of the frame.
+        if self.frame_chain:
+            return None
+        try:
+            return scripts.execute_script(driver, self._JS_GET_PAGE_METRICS)
+        except WebDriverException:
+            return None
+
+    def _get_frame_size(self, driver):
+        # type: (EyesWebDriver) -> ViewPort
+        if self.frame_chain:
+            return self.frame_chain[-1].size
+        try:
+            return driver.get_entire_page_size()
+        except WebDriverException:
+            # For Appium, we can't get the "entire page size", so we use the viewport size.
+            return self.viewport_size
+
+    @staticmethod
+    def _get_scroll_position(driver):
+        # type: (EyesWebDriver) -> Point
+        # For native Appium Apps we can't get the scroll position, so we use (0,0)
+        try:
+            return driver.get_current_position()
+        except (WebDriverException, EyesError):
+            return Point(0, 0)
+
+
 class EyesScreenshot(EyesScreenshotBase):
 
     @staticmethod
@@ -37,9 +102,15 @@ class EyesScreenshot(EyesScreenshotBase):
         """
         return EyesScreenshot(driver, screenshot=screenshot)
 
-    def __init__(self, driver, screenshot=None, screenshot64=None,
-                 is_viewport_screenshot=None, frame_location_in_screenshot=None):
-        # type: (EyesWebDriver, Image.Image, None, tp.Optional[bool], tp.Optional[Point]) -> None
+    def __init__(self, driver,  # type: EyesWebDriver
+                 screenshot=None,  # type: Image.Image
+                 screenshot64=None,  # type: None
+                 is_viewport_screenshot=None,  # type: tp.Optional[bool]
+                 frame_location_in_screenshot=None,  # type: tp.Optional[Point]
+                 context=None,  # type: tp.Optional[ScreenshotContext]
+                 box=None,  # type: tp.Optional[tp.Tuple[int, int, int, int]]
+                 ):
+        # type: (...) -> None
         """
         Initializes a Screenshot instance. Either screenshot or screenshot64 must NOT be None.
         Should not be used directly. Use create_from_image/create_from_base64 instead.
@@ -54,6 +125,9 @@ class EyesScreenshot(EyesScreenshotBase):
                                                 viewport screenshot or a full screenshot.
         :param frame_location_in_screenshot: The location of the frame relative
                                                     to the top,left of the screenshot.
+        :param context: The context of the screenshot this one is a part of. If None, the context
+                        of the driver's current state is used.
+        :param box: The box of the screenshot in the given image, if it's only a part of it.
         :raise EyesError: If the screenshots are None.
         """
         if screenshot is None and screenshot64 is None:
@@ -63,47 +137,60 @@ class EyesScreenshot(EyesScreenshotBase):
             screenshot = image_utils.image_from_bytes(base64.b64decode(screenshot64))
 
         # initializing of screenshot
-        super(EyesScreenshot, self).__init__(image=screenshot)
+        super(EyesScreenshot, self).__init__(image=screenshot, box=box)
 
         self._driver = driver
-        self._viewport_size = driver.get_default_content_viewport_size()  # type: ViewPort
+        self._context = context or ScreenshotContext(driver)
+        self._frame_chain = self._context.frame_chain
+        self._is_viewport_screenshot_hint = is_viewport_screenshot
+        self._frame_location_hint = frame_location_in_screenshot
 
-        self._frame_chain = driver.get_frame_chain()
+    @property
+    def _viewport_size(self):
+        # type: () -> ViewPort
+        return self._context.viewport_size
+
+    @property
+    def _frame_size(self):
+        # type: () -> ViewPort
+        return self._context.frame_size
+
+    @property
+    def _scroll_position(self):
+        # type: () -> Point
+        return self._context.scroll_position
+
+    @cached_property
+    def _is_viewport_screenshot(self):
+        # type: () -> bool
+        if self._is_viewport_screenshot_hint is not None:
+            return self._is_viewport_screenshot_hint
+        width, height = self._size
+        return width <= self._viewport_size['width'] and height <= self._viewport_size['height']
+
+    @cached_property
+    def _frame_location_in_screenshot(self):
+        # type: () -> Point
+        if self._frame_location_hint is not None:
+            return self._frame_location_hint
         if self._frame_chain:
-            chain_len = len(self._frame_chain)
-            self._frame_size = self._frame_chain[chain_len - 1].size
-        else:
-            try:
-                self._frame_size = driver.get_entire_page_size()
-            except WebDriverException:
-                # For Appium, we can't get the "entire page size", so we use the viewport size.
-                self._frame_size = self._viewport_size
-        # For native Appium Apps we can't get the scroll position, so we use (0,0)
-        try:
-            self._scroll_position = driver.get_current_position()
-        except (WebDriverException, EyesError):
-            self._scroll_position = Point(0, 0)
-        if is_viewport_screenshot is None:
-            is_viewport_screenshot = (self._screenshot.width <= self._viewport_size['width']
-                                      and self._screenshot.height <= self._viewport_size['height'])
-        self._is_viewport_screenshot = is_viewport_screenshot
-        if frame_location_in_screenshot is None:
-            if self._frame_chain:
-                frame_location_in_screenshot = EyesScreenshot \
-                    .calc_frame_location_in_screenshot(self._frame_chain, is_viewport_screenshot)
-            else:
-                # The frame is the default content
-                frame_location_in_screenshot = Point(0, 0)
-                if self._is_viewport_screenshot:
-                    frame_location_in_screenshot.offset(-self._scroll_position.x,
-                                                        -self._scroll_position.y)
-        self._frame_location_in_screenshot = frame_location_in_screenshot
-        self._frame_screenshot_intersect = Region(frame_location_in_screenshot.x,
-                                                  frame_location_in_screenshot.y,
-                                                  self._frame_size['width'],
-                                                  self._frame_size['height'])
-        self._frame_screenshot_intersect.intersect(Region(width=self._screenshot.width,
-                                                          height=self._screenshot.height))
+            return EyesScreenshot.calc_frame_location_in_screenshot(self._frame_chain, self._is_viewport_screenshot)
+        # The frame is the default content
+        frame_location_in_screenshot = Point(0, 0)
+        if self._is_viewport_screenshot:
+            frame_location_in_screenshot.offset(-self._scroll_position.x, -self._scroll_position.y)
+        return frame_location_in_screenshot
+
+    @cached_property
+    def _frame_screenshot_intersect(self):
+        # type: () -> Region
+        frame_screenshot_intersect = Region(self._frame_location_in_screenshot.x,
+                                            self._frame_location_in_screenshot.y,
+                                            self._frame_size['width'],
+                                            self._frame_size['height'])
+        width, height = self._size
+        frame_screenshot_intersect.intersect(Region(width=width, height=height))
+        return frame_screenshot_intersect
 
     def calc_frame_location_in_screenshot(frame_chain, is_viewport_screenshot):
         first_frame = frame_chain[0]
@@ -125,9 +212,7 @@ class EyesScreenshot(EyesScreenshotBase):
         return [frame.clone() for frame in self._frame_chain]
 
     def get_base64(self):
-        if not self._screenshot64:
-            self._screenshot64 = image_utils.get_base64(self._screenshot)
-        return self._screenshot64
+        return base64.b64encode(self.get_bytes()).decode('utf-8')
 
     def get_location_relative_to_frame_viewport(self, location):
         result = {'x': location['x'], 'y': location['y']}
@@ -144,14 +229,25 @@ class EyesScreenshot(EyesScreenshotBase):
         # negative offset of the region..
         sub_screenshot_frame_location = Point(-region.left, -region.top)
         # FIXME Calculate relative region location? (same as the java version)
-        screenshot = image_utils.get_image_part(self._screenshot, sub_screenshot_region)
-        return EyesScreenshot(self._driver, screenshot,
+        image, box = self._get_part_box(sub_screenshot_region)
+        return EyesScreenshot(self._driver, image,
                               is_viewport_screenshot=self._is_viewport_screenshot,
-                              frame_location_in_screenshot=sub_screenshot_frame_location)
+                              frame_location_in_screenshot=sub_screenshot_frame_location,
+                              context=self._context, box=box)
 
     def get_element_region_in_frame_viewport(self, element):
-        location, size = element.location, element.size
+        return self.get_region_in_frame_viewport(element.location, element.size)
 
+    def get_region_in_frame_viewport(self, location, size):
+        # type: (tp.Dict[tp.Text, Num], tp.Dict[tp.Text, Num]) -> Region
+        """
+        Gets the part of an element's region (by its location and size in the frame) which is in
+        the frame's viewport.
+
+        :param location: The element's location in the frame.
+        :param size: The element's size.
+        :return: The element's region relative to the frame's viewport.
+        """
         relative_location = self.get_location_relative_to_frame_viewport(location)
 
         x, y = relative_location['x'], relative_location['y']
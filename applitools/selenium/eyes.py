@@ -2,9 +2,12 @@ from __future__ import absolute_import
 
 import base64
 import contextlib
+import multiprocessing
 import typing as tp
+from multiprocessing.pool import ThreadPool
 
 from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.remote.webdriver import WebDriver as RemoteWebDriver
 
 # noinspection PyProtectedMember
@@ -12,8 +15,8 @@ from ..core import logger
 from ..core.eyes_base import FailureReports, EyesBase
 from ..core.match_window_task import MatchWindowTask
 from ..core.triggers import MouseTrigger, TextTrigger
-from ..core.errors import EyesError, TestFailedError
-from ..core.geometry import Region
+from ..core.errors import EyesError, OutOfBoundsError, TestFailedError
+from ..core.geometry import Point, Region
 from ..core.scaling import ContextBasedScaleProvider, FixedScaleProvider
 from ..utils import image_utils, eyes_selenium_utils
 from .webdriver import EyesFrame, EyesWebDriver
@@ -22,7 +25,12 @@ from .target import Target
 
 if tp.TYPE_CHECKING:
     from ..core.scaling import ScaleProvider
-    from ..utils.custom_types import (ViewPort, MatchResult, AnyWebDriver, FrameReference, AnyWebElement)
+    from ..utils.custom_types import (ViewPort, MatchResult, AnyWebDriver, FrameReference, AnyWebElement,
+                                      RegionOrElement)
+
+    # A trigger's type, its action or text, its element, the ids of its frame chain and the screenshot it
+    # relates to.
+    _PendingUserInput = tp.Tuple[tp.Text, tp.Text, AnyWebElement, tp.Tuple[tp.Text, ...], EyesScreenshot]
 
 
 class ScreenshotType(object):
@@ -60,6 +68,40 @@ class Eyes(EyesBase):
         # If true, Eyes will remove the scrollbars from the pages before taking the screenshot.
         self.hide_scrollbars = False  # type: bool
 
+        # If true, Eyes will pause animations and media, and disable transitions and smooth scrolling while
+        # taking the screenshot. Frozen pages usually need little or no wait_before_screenshots.
+        self.freeze_animations = False  # type: bool
+
+        # If true, Eyes will capture elements checked without stitching with the driver's element screenshot
+        # (when supported) instead of cropping them out of a viewport screenshot.
+        self.use_element_screenshots = False  # type: bool
+
+        # If true, Eyes will keep the last full page screenshot and track the page's DOM changes, so later full
+        # page screenshots (including retries) only recapture the parts showing changed content.
+        self.reuse_unchanged_parts = False  # type: bool
+
+        # If true, Eyes will make the page load its lazy content in a single pass before taking a full page
+        # screenshot, rather than relying on wait_before_screenshots after each stitched part.
+        self.load_lazy_content = False  # type: bool
+
+        # The resampling filter (e.g., PIL.Image.BICUBIC) used for scaling screenshots on HiDPI devices.
+        # Screenshots are always scaled by averaging pixel blocks when the device pixel ratio is an integer.
+        self.scale_resample = image_utils.DEFAULT_SCALE_RESAMPLE  # type: int
+
+        # If true, full page screenshots in StitchMode.CSS move between the stitched parts by CSS translation instead
+        # of scrolling (StitchMode.Auto translates them when it chooses CSS stitching).
+        self.translate_stitched_parts = False  # type: bool
+
+        # Whether full page screenshots (of pages no wider than the viewport) are stitched from full
+        # viewport height parts, by measuring the overlap between them and cropping sticky headers/footers.
+        self.detect_stitching_overlap = False  # type: bool
+
+        # If false, clicks and keystrokes on elements aren't recorded as triggers. When true, they are only
+        # recorded as references, and their regions are read by a single script before the next click, frame
+        # switch, navigation or check, whichever comes first.
+        self.track_user_inputs = True  # type: bool
+        self._pending_user_inputs = []  # type: tp.List[_PendingUserInput]
+
     def _obtain_screenshot_type(self, is_element, inside_a_frame, stitch_content, force_fullpage, is_region=False):
         # type:(bool, bool, bool, bool, bool) -> str
         if stitch_content or force_fullpage:
@@ -137,7 +179,11 @@ class Eyes(EyesBase):
                 self.set_viewport_size(self._driver, self._viewport_size)
             else:
                 logger.debug("No viewport size given. Extracting the viewport size from the driver...")
-                self._viewport_size = self.get_viewport_size()
+                viewport_size = eyes_selenium_utils.get_known_viewport_size(self._driver)
+                if viewport_size is None:
+                    viewport_size = self.get_viewport_size()
+                    eyes_selenium_utils.get_driver_profile(self._driver)['viewport_size'] = viewport_size
+                self._viewport_size = dict(viewport_size)
                 logger.debug("Viewport size {0}".format(self._viewport_size))
         except EyesError:
             raise TestFailedError('Failed to assign viewport size!')
@@ -157,10 +203,7 @@ class Eyes(EyesBase):
 
     def _get_inferred_environment(self):
         # type: () -> tp.Optional[tp.Text]
-        try:
-            user_agent = self._driver.execute_script('return navigator.userAgent')
-        except WebDriverException:
-            user_agent = None
+        user_agent = eyes_selenium_utils.get_user_agent(self._driver)
         if user_agent:
             return "useragent:%s" % user_agent
         return None
@@ -171,6 +214,9 @@ class Eyes(EyesBase):
         if not self.is_open():
             raise EyesError('Eyes not open!')
 
+        self._driver.reset_frames_cache()
+        self._resolve_user_inputs()
+
         if not self._running_session:
             self._start_session()
             self._match_window_task = MatchWindowTask(self, self._agent_connector,
@@ -199,7 +245,7 @@ class Eyes(EyesBase):
 
         logger.info('Trying to extract device pixel ratio...')
         try:
-            device_pixel_ratio = image_utils.get_device_pixel_ratio(self._driver)
+            device_pixel_ratio = eyes_selenium_utils.get_device_pixel_ratio(self._driver)
         except Exception as e:
             logger.info('Failed to extract device pixel ratio! Using default. Error %s ' % e)
             device_pixel_ratio = self._DEFAULT_DEVICE_PIXEL_RATIO
@@ -207,11 +253,21 @@ class Eyes(EyesBase):
 
         logger.info("Setting scale provider...")
         try:
+            # The viewport size is usually known since it was set (or read) when opening, and the
+            # scale ratios are kept per browser session, viewport size and device pixel ratio, so in the
+            # steady state the scale ratio only costs reading the window size.
+            profile = eyes_selenium_utils.get_driver_profile(self._driver)
+            viewport_size = eyes_selenium_utils.get_known_viewport_size(self._driver)
+            if viewport_size is None:
+                viewport_size = self._driver.get_default_content_viewport_size()
+            scale_ratios = profile.setdefault('scale_ratios', {}).setdefault(
+                (viewport_size['width'], viewport_size['height'], device_pixel_ratio), {})
             scale_provider = ContextBasedScaleProvider(
-                top_level_context_entire_size=self._driver.get_entire_page_size(),
-                viewport_size=self._driver.get_viewport_size(),
+                top_level_context_entire_size=self._get_top_level_context_entire_size,
+                viewport_size=viewport_size,
                 device_pixel_ratio=device_pixel_ratio,
-                is_mobile_device=eyes_selenium_utils.is_mobile_device(self._driver))  # type: ScaleProvider
+                is_mobile_device=eyes_selenium_utils.is_mobile_device(self._driver),
+                known_scale_ratios=scale_ratios)  # type: ScaleProvider
         except Exception:
             # This can happen in Appium for example.
             logger.info("Failed to set ContextBasedScaleProvider.")
@@ -220,15 +276,37 @@ class Eyes(EyesBase):
         logger.info("Done!")
         return scale_provider
 
+    def _get_top_level_context_entire_size(self):
+        # type: () -> tp.Optional[ViewPort]
+        try:
+            return eyes_selenium_utils.get_current_frame_content_entire_size(self._driver)
+        except EyesError:
+            return None
+
     @contextlib.contextmanager
     def hide_scrollbars_if_needed(self):
         if self.hide_scrollbars:
             original_overflow = self._driver.hide_scrollbars()
         yield
-        if self.hide_scrollbars:
+        # Nothing was changed if the scrollbars were already hidden.
+        if self.hide_scrollbars and original_overflow != 'hidden':
             self._driver.set_overflow(original_overflow)
 
+    @contextlib.contextmanager
+    def freeze_animations_if_needed(self):
+        if self.freeze_animations:
+            eyes_selenium_utils.freeze_animations(self._driver)
+        try:
+            yield
+        finally:
+            if self.freeze_animations:
+                eyes_selenium_utils.unfreeze_animations(self._driver)
+
     def _get_screenshot(self):
+        with self.freeze_animations_if_needed():
+            return self._capture_screenshot()
+
+    def _capture_screenshot(self):
         scale_provider = self._update_scaling_params()
 
         if self._screenshot_type == ScreenshotType.ENTIRE_ELEMENT_SCREENSHOT:
@@ -262,9 +340,46 @@ class Eyes(EyesBase):
                                                           scale_provider)
         return EyesScreenshot.create_from_image(screenshot, self._driver)
 
+    def _element_screenshot(self, element, scale_provider):
+        # type: (AnyWebElement, ScaleProvider) -> tp.Optional[EyesScreenshot]
+        """
+        Captures only the element's pixels, using the driver's element screenshot.
+
+        :return: The element's screenshot, or None if the driver doesn't support element screenshots or
+                 the screenshot doesn't match the element's size (e.g., it was clipped).
+        """
+        if eyes_selenium_utils.is_mobile_device(self._driver):
+            return None
+        EyesWebDriver._wait_before_screenshot(self.seconds_to_wait_screenshot)
+        try:
+            screenshot = image_utils.image_from_bytes(base64.b64decode(element.screenshot_as_base64))
+        except WebDriverException as e:
+            logger.info("Element screenshot isn't available, using a viewport screenshot instead: {}".format(e))
+            return None
+        # The element screenshot scrolls the element into view, so its location is read afterwards.
+        location, size = element.location, element.size
+        pixel_ratio = scale_provider.device_pixel_ratio
+        if (abs(screenshot.width - size['width'] * pixel_ratio) > pixel_ratio
+                or abs(screenshot.height - size['height'] * pixel_ratio) > pixel_ratio):
+            logger.info("Element screenshot size {} doesn't match the element size {}, using a viewport "
+                        "screenshot instead.".format(screenshot.size, size))
+            return None
+        if pixel_ratio != 1:
+            screenshot = image_utils.scale_image(screenshot, 1.0 / pixel_ratio, self.scale_resample)
+            screenshot = screenshot.crop((0, 0, int(round(size['width'])), int(round(size['height']))))
+        scroll_position = self._driver.get_current_position()
+        # The frame's (0,0) relative to the element, same as for a sub screenshot of the viewport.
+        frame_location = Point(scroll_position.x - location['x'], scroll_position.y - location['y'])
+        return EyesScreenshot(self._driver, screenshot, is_viewport_screenshot=True,
+                              frame_location_in_screenshot=frame_location)
+
     def _region_or_screenshot(self, scale_provider):
         # type: (ScaleProvider) -> EyesScreenshot
         logger.info('Not entire element screenshot requested')
+        if self.use_element_screenshots and not isinstance(self._region_to_check, Region):
+            screenshot = self._element_screenshot(self._region_to_check, scale_provider)
+            if screenshot is not None:
+                return screenshot
         screenshot = self._viewport_screenshot(scale_provider)
         if isinstance(self._region_to_check, Region):
             screenshot = screenshot.get_sub_screenshot_by_region(self._region_to_check)
@@ -288,7 +403,7 @@ class Eyes(EyesBase):
         scale_provider.update_scale_ratio(screenshot.width)
         pixel_ratio = 1 / scale_provider.scale_ratio
         if pixel_ratio != 1.0:
-            screenshot = image_utils.scale_image(screenshot, 1.0 / pixel_ratio)
+            screenshot = image_utils.scale_image(screenshot, 1.0 / pixel_ratio, self.scale_resample)
         return EyesScreenshot.create_from_image(screenshot, self._driver).get_viewport_screenshot()
 
     def open(self, driver, app_name, test_name, viewport_size=None):
@@ -429,6 +544,78 @@ class Eyes(EyesBase):
         self.check_region_by_element(self._driver.find_element(by, value), tag,
                                      match_timeout, target, stitch_content)
 
+    def check_regions(self, regions,  # type: tp.List[RegionOrElement]
+                      tags=None,  # type: tp.Optional[tp.List[tp.Optional[tp.Text]]]
+                      match_timeout=-1,  # type: int
+                      targets=None,  # type: tp.Optional[tp.List[tp.Optional[Target]]]
+                      ):
+        # type: (...) -> tp.List[MatchResult]
+        """
+        Checks several regions and/or elements shown in the viewport, using a single screenshot. Each
+        region is cut out of the same viewport screenshot and matched in order. A region which doesn't
+        match is checked again as with check_region, which re-captures it until match_timeout passes.
+
+        :param regions: The regions (relative to the viewport of the current frame) and elements to check.
+        :param tags: The description of each of the visual validation checkpoints.
+        :param match_timeout: (int) Timeout for each of the visual validation checkpoints (milliseconds).
+        :param targets: The target of each of the checks.
+        :return: The match result of each of the regions.
+        """
+        if self.is_disabled:
+            logger.info('check_regions(): ignored (disabled)')
+            return []
+        logger.info("check_regions({} regions)".format(len(regions)))
+        tags = tags or [None] * len(regions)
+        targets = [target or Target() for target in (targets or [None] * len(regions))]
+        self._prepare_to_check()
+
+        with self.hide_scrollbars_if_needed(), self.freeze_animations_if_needed():
+            viewport_screenshot = self._viewport_screenshot(self._update_scaling_params())
+            sub_screenshots = []  # type: tp.List[tp.Optional[EyesScreenshot]]
+            for region in regions:
+                try:
+                    if isinstance(region, Region):
+                        sub_screenshots.append(viewport_screenshot.get_sub_screenshot_by_region(region))
+                    else:
+                        sub_screenshots.append(viewport_screenshot.get_sub_screenshot_by_element(region))
+                except OutOfBoundsError as e:
+                    logger.info("{}, it will be captured separately.".format(e))
+                    sub_screenshots.append(None)
+        if not self.stream_screenshot_upload:
+            # Encoding releases the GIL, so the sub screenshots are encoded concurrently (and cached).
+            to_encode = [screenshot for screenshot in sub_screenshots if screenshot is not None]
+            # The sub screenshots share the viewport screenshot's image, which might be decoded lazily.
+            # It's decoded here, since decoding it from several threads at once fails.
+            # noinspection PyProtectedMember
+            viewport_screenshot._screenshot.load()
+            pool = ThreadPool(max(min(len(to_encode), multiprocessing.cpu_count()), 1))
+            try:
+                pool.map(lambda screenshot: screenshot.get_bytes(self.screenshot_encoder), to_encode)
+            finally:
+                pool.close()
+                pool.join()
+
+        # Matches are sent in order, so the steps are recorded in the order of the regions.
+        results = []
+        for region, sub_screenshot, tag, target in zip(regions, sub_screenshots, tags, targets):
+            # In case the region has to be re-captured.
+            self._region_to_check = region
+            self._screenshot_type = ScreenshotType.REGION_OR_ELEMENT_SCREENSHOT
+            result = None
+            if sub_screenshot is not None:
+                result = self._match_window_task.match_screenshot(sub_screenshot, tag, self._user_inputs,
+                                                                  self.default_match_settings, target,
+                                                                  ignore_mismatch=True)
+            if result is None or not result['as_expected']:
+                result = self._match_window_task.match_window(match_timeout, tag,
+                                                              self._user_inputs,
+                                                              self.default_match_settings,
+                                                              target,
+                                                              self._should_match_once_on_timeout)
+            self._handle_match_result(result, tag)
+            results.append(result)
+        return results
+
     def check_region_in_frame_by_selector(self, frame_reference,  # type: FrameReference
                                           by,  # type: tp.Text
                                           value,  # type: tp.Text
@@ -469,26 +656,8 @@ class Eyes(EyesBase):
         :param action: Mouse action (click, double click etc.)
         :param element: The element on which the action was performed.
         """
-        if self.is_disabled:
-            logger.debug("add_mouse_trigger: Ignoring %s (disabled)" % action)
-            return
-        # Triggers are activated on the last checked window.
-        if self._last_screenshot is None:
-            logger.debug("add_mouse_trigger: Ignoring %s (no screenshot)" % action)
-            return
-        if not EyesFrame.is_same_frame_chain(self._driver.get_frame_chain(),
-                                             self._last_screenshot.get_frame_chain()):
-            logger.debug("add_mouse_trigger: Ignoring %s (different frame)" % action)
-            return
-        control = self._last_screenshot.get_intersected_region_by_element(element)
-        # Making sure the trigger is within the last screenshot bounds
-        if control.is_empty():
-            logger.debug("add_mouse_trigger: Ignoring %s (out of bounds)" % action)
-            return
-        cursor = control.middle_offset
-        trigger = MouseTrigger(action, control, cursor)
-        self._user_inputs.append(trigger)
-        logger.info("add_mouse_trigger: Added %s" % trigger)
+        # Clicks often navigate or remove the element, so its region is read before the click happens.
+        self._record_user_input('mouse', action, element, resolve_now=True)
 
     def add_text_trigger_by_element(self, element, text):
         # type: (AnyWebElement, tp.Text) -> None
@@ -498,22 +667,79 @@ class Eyes(EyesBase):
         :param element: The element to which the text was sent.
         :param text: The trigger's text.
         """
+        # Pressing enter might submit a form, which makes the element stale.
+        submits = Keys.ENTER in text or Keys.RETURN in text
+        self._record_user_input('text', text, element, resolve_now=submits)
+
+    def _record_user_input(self, trigger_type, value, element, resolve_now=False):
+        # type: (tp.Text, tp.Text, AnyWebElement, bool) -> None
+        """
+        Records a trigger without any round trips to the browser. The element's region is computed
+        along with the other pending triggers, before the next click, frame switch, navigation or
+        check (see _resolve_user_inputs).
+
+        :param trigger_type: Either 'mouse' or 'text'.
+        :param value: The mouse action, or the text.
+        :param element: The element on which the action was performed.
+        :param resolve_now: Whether to compute the pending triggers right away, since the action
+                            is about to make the element stale.
+        """
+        if not self.track_user_inputs:
+            return
         if self.is_disabled:
-            logger.debug("add_text_trigger: Ignoring '%s' (disabled)" % text)
+            logger.debug("add_%s_trigger: Ignoring %s (disabled)" % (trigger_type, value))
             return
         # Triggers are activated on the last checked window.
         if self._last_screenshot is None:
-            logger.debug("add_text_trigger: Ignoring '%s' (no screenshot)" % text)
+            logger.debug("add_%s_trigger: Ignoring %s (no screenshot)" % (trigger_type, value))
+            return
+        screenshot_frame_chain = self._last_screenshot.get_frame_chain()
+        if not EyesFrame.is_same_frame_chain(self._driver.get_frame_chain(), screenshot_frame_chain):
+            logger.debug("add_%s_trigger: Ignoring %s (different frame)" % (trigger_type, value))
             return
-        if not EyesFrame.is_same_frame_chain(self._driver.get_frame_chain(),
-                                             self._last_screenshot.get_frame_chain()):
-            logger.debug("add_text_trigger: Ignoring %s (different frame)" % text)
+        frame_ids = tuple(frame.id_ for frame in screenshot_frame_chain)
+        self._pending_user_inputs.append((trigger_type, value, element, frame_ids, self._last_screenshot))
+        if resolve_now:
+            self._resolve_user_inputs()
+
+    def _resolve_user_inputs(self):
+        # type: () -> None
+        """
+        Creates the pending triggers and adds them to the user inputs. The regions of all their
+        elements are read by a single script. This must be called while the driver is still in the
+        frame the triggers were recorded in.
+        """
+        pending, self._pending_user_inputs = self._pending_user_inputs, []
+        if not pending:
             return
-        control = self._last_screenshot.get_intersected_region_by_element(element)
-        # Making sure the trigger is within the last screenshot bounds
-        if control.is_empty():
-            logger.debug("add_text_trigger: Ignoring %s (out of bounds)" % text)
+        # The elements can only be read from the frame they were recorded in.
+        frame_ids = tuple(frame.id_ for frame in self._driver.get_frame_chain())
+        pending_in_frame = [p for p in pending if p[3] == frame_ids]
+        if len(pending_in_frame) < len(pending):
+            logger.debug("Ignoring %d triggers (different frame)" % (len(pending) - len(pending_in_frame)))
+        if not pending_in_frame:
             return
-        trigger = TextTrigger(control, text)
-        self._user_inputs.append(trigger)
-        logger.info("add_text_trigger: Added %s" % trigger)
+        elements_bounds = eyes_selenium_utils.get_elements_bounds(self._driver, [p[2] for p in pending_in_frame])
+        for (trigger_type, value, _, _, screenshot), bounds in zip(pending_in_frame, elements_bounds):
+            if bounds is None:
+                logger.debug("add_%s_trigger: Ignoring %s (element is gone)" % (trigger_type, value))
+                continue
+            try:
+                control = screenshot.get_intersected_region(screenshot.get_region_in_frame_viewport(*bounds))
+            except OutOfBoundsError:
+                control = None
+            # Making sure the trigger is within the last screenshot bounds
+            if control is None or control.is_empty():
+                logger.debug("add_%s_trigger: Ignoring %s (out of bounds)" % (trigger_type, value))
+                continue
+            if trigger_type == 'mouse':
+                trigger = MouseTrigger(value, control, control.middle_offset)
+            else:
+                trigger = TextTrigger(control, value)
+            self._user_inputs.append(trigger)
+            logger.info("add_%s_trigger: Added %s" % (trigger_type, trigger))
+
+    def _reset_last_screenshot(self):
+        # type: () -> None
+        super(Eyes, self)._reset_last_screenshot()
+        self._pending_user_inputs = []
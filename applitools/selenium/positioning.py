@@ -2,21 +2,22 @@ from __future__ import absolute_import
 
 import abc
 import re
+import time
 import typing as tp
 
 from selenium.common.exceptions import WebDriverException
 
 from ..common import StitchMode
 from ..core import logger, EyesError, Point
-from ..utils import ABC
+from ..utils import ABC, scripts
 
 if tp.TYPE_CHECKING:
-    from ..utils.custom_types import AnyWebDriver, ViewPort, AnyWebElement
+    from ..utils.custom_types import AnyWebDriver, ViewPort, AnyWebElement, Num
 
 
 class PositionProvider(ABC):
     """ Encapsulates page/element positioning """
-    _JS_GET_CONTENT_ENTIRE_SIZE = """
+    _JS_GET_CONTENT_ENTIRE_SIZE = scripts.register('entireSize', """
         var scrollWidth = document.documentElement.scrollWidth;
         var bodyScrollWidth = document.body.scrollWidth;
         var totalWidth = Math.max(scrollWidth, bodyScrollWidth);
@@ -27,17 +28,65 @@ class PositionProvider(ABC):
         var maxDocElementHeight = Math.max(clientHeight, scrollHeight);
         var maxBodyHeight = Math.max(bodyClientHeight, bodyScrollHeight);
         var totalHeight = Math.max(maxDocElementHeight, maxBodyHeight);
-        return [totalWidth, totalHeight];";
-    """
+        return [totalWidth, totalHeight];""")
+    # Calls the callback after the given delay and the next animation frame. The timeout fallback is
+    # for windows in which animation frames aren't fired (e.g., hidden windows).
+    _JS_REPORT_AFTER_NEXT_FRAME_FORMATTED_STR = scripts.minify("""
+        var callback = arguments[arguments.length - 1];
+        var delay = arguments[arguments.length - 2];
+        var reported = false;
+        function report() {
+            if (!reported) {
+                reported = true;
+                callback(%s);
+            }
+        }
+        setTimeout(function () {
+            window.requestAnimationFrame(report);
+            setTimeout(report, 100);
+        }, delay);""")
 
     def __init__(self, driver):
         # type: (AnyWebDriver) -> None
         self._driver = driver
         self._states = []  # type: tp.List[Point]
+        self._is_async_script_supported = True
 
-    def _execute_script(self, script):
-        # type: (tp.Text) -> tp.List[int]
-        return self._driver.execute_script(script)
+    def _execute_script(self, script, *args):
+        # type: (tp.Text, *tp.Any) -> tp.Any
+        return scripts.execute_script(self._driver, script, *args)
+
+    def _set_position_and_report_script(self, location):
+        # type: (Point) -> tp.Optional[tp.Tuple[tp.Text, tp.List]]
+        """
+        :return: An async script (and its arguments) which sets the position and reports back the position
+            reached after the next animation frame, or None if the provider has no such script.
+        """
+        return None
+
+    def set_position_and_report(self, location, seconds_to_wait=0):
+        # type: (Point, Num) -> Point
+        """
+        Goes to the specified location and returns the position actually reached, once the page had
+        time to render it. When possible, this is done in a single (async) script.
+
+        :param location: The position to set.
+        :param seconds_to_wait: Seconds to wait after setting the position, before it is read back.
+        :return: The current position.
+        """
+        script_and_args = self._set_position_and_report_script(location)
+        if script_and_args is not None and self._is_async_script_supported:
+            script, args = script_and_args
+            logger.debug("Setting position to {} and waiting {} ms...".format(location, int(seconds_to_wait * 1000)))
+            try:
+                x, y = self._driver.execute_async_script(script, *(args + [int(seconds_to_wait * 1000)]))
+                return Point(x, y)
+            except WebDriverException as e:
+                logger.info("Failed to set position by async script, falling back to separate calls: {}".format(e))
+                self._is_async_script_supported = False
+        self.set_position(location)
+        time.sleep(seconds_to_wait)
+        return self.get_current_position()
 
     @abc.abstractmethod
     def get_current_position(self):
@@ -62,7 +111,7 @@ class PositionProvider(ABC):
         :return: The entire size of the container which the position is relative to.
         """
         try:
-            width, height = self._driver.execute_script(self._JS_GET_CONTENT_ENTIRE_SIZE)
+            width, height = self._execute_script(self._JS_GET_CONTENT_ENTIRE_SIZE)
         except WebDriverException:
             raise EyesError('Failed to extract entire size!')
         return dict(width=width, height=height)
@@ -81,16 +130,27 @@ class PositionProvider(ABC):
 
 
 class ScrollPositionProvider(PositionProvider):
-    _JS_GET_CURRENT_SCROLL_POSITION = """
+    _JS_GET_CURRENT_SCROLL_POSITION = scripts.register('scrollPosition', """
         var doc = document.documentElement;
         var x = window.scrollX || ((window.pageXOffset || doc.scrollLeft) - (doc.clientLeft || 0));
         var y = window.scrollY || ((window.pageYOffset || doc.scrollTop) - (doc.clientTop || 0));
-        return [x, y]"""
+        return [x, y]""")
+    _JS_SCROLL_TO = scripts.register('scrollTo', "window.scrollTo(arguments[0], arguments[1]);")
+    _JS_SCROLL_AND_REPORT = scripts.minify("""
+        window.scrollTo(arguments[0], arguments[1]);
+    """ + PositionProvider._JS_REPORT_AFTER_NEXT_FRAME_FORMATTED_STR % """(function () {
+            var doc = document.documentElement;
+            var x = window.scrollX || ((window.pageXOffset || doc.scrollLeft) - (doc.clientLeft || 0));
+            var y = window.scrollY || ((window.pageYOffset || doc.scrollTop) - (doc.clientTop || 0));
+            return [x, y];
+        }())""")
 
     def set_position(self, location):
-        scroll_command = "window.scrollTo({0}, {1})".format(location.x, location.y)
-        logger.debug(scroll_command)
-        self._execute_script(scroll_command)
+        logger.debug("window.scrollTo({0}, {1})".format(location.x, location.y))
+        self._execute_script(self._JS_SCROLL_TO, location.x, location.y)
+
+    def _set_position_and_report_script(self, location):
+        return self._JS_SCROLL_AND_REPORT, [location.x, location.y]
 
     def get_current_position(self):
         try:
@@ -104,23 +164,36 @@ class ScrollPositionProvider(PositionProvider):
 
 class CSSTranslatePositionProvider(PositionProvider):
     _JS_TRANSFORM_KEYS = ["transform", "-webkit-transform"]
+    _JS_SET_TRANSFORMS = scripts.register('setTransforms', """
+        var transforms = arguments[0];
+        for (var key in transforms) {
+            document.documentElement.style[key] = transforms[key];
+        }""")
+    _JS_GET_CURRENT_TRANSFORMS = scripts.register('getTransforms', """
+        var style = document.documentElement.style;
+        return {%s};""" % ', '.join("'{0}': style['{0}']".format(key) for key in _JS_TRANSFORM_KEYS))
 
     def __init__(self, driver):
         super(CSSTranslatePositionProvider, self).__init__(driver)
         self._current_position = Point(0, 0)
 
-    def _set_transform(self, transform_list):
+    @staticmethod
+    def _get_set_transform_script(transform_list):
         script = ''
         for key, value in transform_list.items():
             script += "document.documentElement.style['{}'] = '{}';".format(key, value)
-        self._execute_script(script)
+        return script
+
+    def _set_transform(self, transform_list):
+        self._execute_script(self._JS_SET_TRANSFORMS, transform_list)
+
+    def _get_transform_list(self, location):
+        translate_command = "translate(-{}px, -{}px)".format(location.x, location.y)
+        logger.debug(translate_command)
+        return dict((key, translate_command) for key in self._JS_TRANSFORM_KEYS)
 
     def _get_current_transform(self):
-        script = 'return {'
-        for key in self._JS_TRANSFORM_KEYS:
-            script += "'{0}': document.documentElement.style['{0}'],".format(key)
-        script += ' }'
-        return self._execute_script(script)
+        return self._execute_script(self._JS_GET_CURRENT_TRANSFORMS)
 
     def get_current_position(self):
         return self._current_position.clone()
@@ -141,11 +214,19 @@ class CSSTranslatePositionProvider(PositionProvider):
         return Point(float(x), float(y))
 
     def set_position(self, location):
-        translate_command = "translate(-{}px, -{}px)".format(location.x, location.y)
-        logger.debug(translate_command)
-        transform_list = dict((key, translate_command) for key in self._JS_TRANSFORM_KEYS)
-        self._set_transform(transform_list)
+        self._set_transform(self._get_transform_list(location))
+        self._current_position = location.clone()
+
+    def _set_position_and_report_script(self, location):
+        # The position is known, so we only need to wait for the transform to be rendered. It's read at
+        # the top level, since "arguments" in the report function are that function's own.
+        script = "var position = arguments[0];" + self._get_set_transform_script(self._get_transform_list(location))
+        return script + self._JS_REPORT_AFTER_NEXT_FRAME_FORMATTED_STR % 'position', [[location.x, location.y]]
+
+    def set_position_and_report(self, location, seconds_to_wait=0):
+        position = super(CSSTranslatePositionProvider, self).set_position_and_report(location, seconds_to_wait)
         self._current_position = location.clone()
+        return position
 
     def push_state(self):
         """
@@ -174,11 +255,31 @@ class ElementPositionProvider(PositionProvider):
         logger.info("Current position: {}".format(position))
         return position
 
+    _JS_SCROLL_AND_REPORT = scripts.minify("""
+        var element = arguments[0];
+        element.scrollLeft = arguments[1];
+        element.scrollTop = arguments[2];
+    """) + PositionProvider._JS_REPORT_AFTER_NEXT_FRAME_FORMATTED_STR % (
+        "[Math.ceil(element.scrollLeft), Math.ceil(element.scrollTop)]")
+
     def set_position(self, location):
         logger.info("Scrolling element to {}".format(location))
         self._element.scroll_to(location)
         logger.info("Done scrolling element!")
 
+    def set_position_and_report(self, location, seconds_to_wait=0):
+        position = super(ElementPositionProvider, self).set_position_and_report(location, seconds_to_wait)
+        # The element was scrolled by a script of our own, so its cached metrics are stale.
+        reset_metrics = getattr(self._element, 'reset_metrics', None)
+        if reset_metrics is not None:
+            reset_metrics()
+        return position
+
+    def _set_position_and_report_script(self, location):
+        # noinspection PyUnresolvedReferences
+        element = getattr(self._element, 'element', self._element)
+        return self._JS_SCROLL_AND_REPORT, [element, location.x, location.y]
+
     def get_entire_size(self):
         try:
             size = {'width': self._element.get_scroll_width(), 'height': self._element.get_scroll_height()}
@@ -192,7 +293,7 @@ def build_position_provider_for(stitch_mode,  # type: tp.Text
                                 driver,  # type: AnyWebDriver
                                 ):
     # type: (...) -> PositionProvider
-    if stitch_mode == StitchMode.Scroll:
+    if stitch_mode in (StitchMode.Scroll, StitchMode.Resize, StitchMode.Auto):
         return ScrollPositionProvider(driver)
     elif stitch_mode == StitchMode.CSS:
         return CSSTranslatePositionProvider(driver)
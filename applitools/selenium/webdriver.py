@@ -1,10 +1,12 @@
 from __future__ import absolute_import
 
 import base64
+import math
 import time
 import typing as tp
 
 from PIL import Image
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.remote.switch_to import SwitchTo
 from selenium.webdriver.remote.webdriver import WebDriver
@@ -14,23 +16,29 @@ from ..common import StitchMode
 from ..core import logger
 from ..core.errors import EyesError
 from ..core.geometry import Point, Region
-from ..utils import cached_property, image_utils, general_utils, eyes_selenium_utils
-from .positioning import ElementPositionProvider, build_position_provider_for
+from ..utils import cached_property, image_utils, general_utils, eyes_selenium_utils, scripts
+from .positioning import CSSTranslatePositionProvider, ElementPositionProvider, build_position_provider_for
 from .webelement import EyesWebElement
 
 if tp.TYPE_CHECKING:
     from ..core.scaling import ScaleProvider
+    from .positioning import PositionProvider
     from ..utils.custom_types import Num, ViewPort, FrameReference, AnyWebDriver, AnyWebElement
     from .eyes import Eyes
 
+    # The position of a part, the box cropped out of its screenshot and where it was pasted.
+    _StitchedPart = tp.Tuple[Point, tp.Tuple[int, int, int, int], tp.Tuple[int, int]]
+
 
 class _EyesSwitchTo(object):
     """
     Wraps a selenium "SwitchTo" object, so we can keep track of switching between frames.
     """
-    _READONLY_PROPERTIES = ['alert', 'active_element']
     PARENT_FRAME = 1
 
+    # The rest of the "SwitchTo" interface is forwarded to the underlying object.
+    __getattr__ = general_utils.create_forwarding_getattr('_switch_to')
+
     def __init__(self, driver, switch_to):
         # type: (EyesWebDriver, SwitchTo) -> None
         """
@@ -41,7 +49,6 @@ class _EyesSwitchTo(object):
         """
         self._switch_to = switch_to
         self._driver = driver  # type: AnyWebDriver
-        general_utils.create_proxy_interface(self, switch_to, self._READONLY_PROPERTIES)
 
     def frame(self, frame_reference):
         # type: (FrameReference) -> None
@@ -50,6 +57,10 @@ class _EyesSwitchTo(object):
 
         :param frame_reference: The reference to the frame.
         """
+        self._switch_to_frame(frame_reference)
+
+    def _switch_to_frame(self, frame_reference, parent_scroll_position=None):
+        # type: (FrameReference, tp.Optional[Point]) -> None
         # Find the frame's location and add it to the current driver offset
         if isinstance(frame_reference, str):
             frame_element = self._driver.find_element_by_name(frame_reference)
@@ -63,7 +74,7 @@ class _EyesSwitchTo(object):
             frame_element = frame_reference
         # Calling the underlying "SwitchTo" object
         # noinspection PyProtectedMember
-        self._driver._will_switch_to(frame_reference, frame_element)
+        self._driver._will_switch_to(frame_reference, frame_element, parent_scroll_position)
         self._switch_to.frame(frame_reference)
 
     def frames(self, frame_chain):
@@ -74,8 +85,9 @@ class _EyesSwitchTo(object):
         :param frame_chain: A list of frames.
         """
         for frame in frame_chain:
-            self._driver.scroll_to(frame.parent_scroll_position)
-            self.frame(frame.reference)
+            # The parent's scroll position is restored (in the same round trip as reading the frame's
+            # metadata) before switching, so the frame chain is recorded the same way it was.
+            self._switch_to_frame(frame.reference, frame.parent_scroll_position)
 
     def default_content(self):
         # type: () -> None
@@ -171,25 +183,74 @@ class EyesFrame(object):
                          self.parent_scroll_position.clone())
 
 
+class _StitchedPage(object):
+    """
+    A stitched full page screenshot, kept so its unchanged parts can be reused.
+    """
+
+    def __init__(self, image, region, entire_page_size, viewport_size, pixel_ratio, stitch_mode, parts):
+        # type: (Image.Image, Region, ViewPort, ViewPort, float, tp.Text, tp.List[_StitchedPart]) -> None
+        """
+        Ctor.
+
+        :param image: The (unscaled) stitched image.
+        :param region: The region of the page the image shows.
+        :param entire_page_size: The size of the page when it was captured.
+        :param viewport_size: The size of the viewport when the page was captured.
+        :param pixel_ratio: The ratio between the image's pixels and the page's pixels.
+        :param stitch_mode: The stitch mode the page was captured with.
+        :param parts: The position of each part, the box cropped out of its screenshot and where it was pasted.
+        """
+        self.image = image
+        self.region = region
+        self.entire_page_size = entire_page_size
+        self.viewport_size = viewport_size
+        self.pixel_ratio = pixel_ratio
+        self.stitch_mode = stitch_mode
+        self.parts = parts
+
+
 class EyesWebDriver(object):
     """
     A wrapper for selenium web driver which creates wrapped elements, and notifies us about
     events / actions.
     """
-    # Properties require special handling since even testing if they're callable "activates"
-    # them, which makes copying them automatically a problem.
-    _READONLY_PROPERTIES = ['application_cache', 'current_url', 'current_window_handle',
-                            'desired_capabilities', 'log_types', 'name', 'page_source', 'title',
-                            'window_handles', 'switch_to', 'mobile', 'current_context', 'context',
-                            'current_activity', 'network_connection', 'available_ime_engines',
-                            'active_ime_engine', 'device_time', 'w3c', 'contexts', 'current_package']
-    _SETTABLE_PROPERTIES = ['orientation', 'file_detector']
+    # The rest of the driver interface is forwarded to the underlying driver. Properties which can
+    # be set are forwarded explicitly, since setting them would otherwise only affect the wrapper.
+    __getattr__ = general_utils.create_forwarding_getattr('driver')
+    file_detector = general_utils.create_proxy_property('file_detector', 'driver', True)
 
     # This should pretty much cover all scroll bars (and some fixed position footer elements :) ).
     _MAX_SCROLL_BAR_SIZE = 50
 
     _MIN_SCREENSHOT_PART_HEIGHT = 10
 
+    # The overlap kept between consecutive parts when stitching by overlap detection, so scroll
+    # drift can be measured.
+    _MIN_STITCH_OVERLAP = 10
+
+    # Stitching costs measured for StitchMode.Auto, by browser name, version and whether it's headless, so
+    # they're only measured once per browser type.
+    _stitching_costs_cache = {}  # type: tp.Dict[tp.Tuple[tp.Text, tp.Text, bool], tp.Dict[tp.Text, tp.Optional[float]]]
+
+    # Restores the parent's scroll position (if given), reads a frame element's location (including its
+    # borders), its size and the parent's scroll position, then scrolls to the frame, all in a single
+    # round trip.
+    _JS_GET_FRAME_METADATA_AND_SCROLL = scripts.register('frameMetadataAndScroll', """
+        var frame = arguments[0];
+        if (arguments[1]) {
+            window.scrollTo(arguments[1][0], arguments[1][1]);
+        }
+        var doc = document.documentElement;
+        var x = window.scrollX || ((window.pageXOffset || doc.scrollLeft) - (doc.clientLeft || 0));
+        var y = window.scrollY || ((window.pageYOffset || doc.scrollTop) - (doc.clientTop || 0));
+        var rect = frame.getBoundingClientRect();
+        var style = window.getComputedStyle(frame);
+        var left = Math.round(rect.left + x) + (parseInt(style.borderLeftWidth, 10) || 0);
+        var top = Math.round(rect.top + y) + (parseInt(style.borderTopWidth, 10) || 0);
+        window.scrollTo(left, top);
+        return [left, top, Math.round(rect.width), Math.round(rect.height), x, y];""")
+
     def __init__(self, driver, eyes, stitch_mode=StitchMode.Scroll):
         # type: (WebDriver, Eyes, tp.Text) -> None
         """
@@ -201,25 +262,20 @@ class EyesWebDriver(object):
         """
         self.driver = driver
         self._eyes = eyes
+        self._stitch_mode = stitch_mode
+        self._stitching_costs = None  # type: tp.Optional[tp.Dict[tp.Text, tp.Optional[float]]]
+        self._effective_stitch_mode = None  # type: tp.Optional[tp.Text]
+        self._stitched_page = None  # type: tp.Optional[_StitchedPage]
         self._origin_position_provider = build_position_provider_for(StitchMode.Scroll, driver)
         self._position_provider = build_position_provider_for(stitch_mode, driver)
         # tp.List of frames the user switched to, and the current offset, so we can properly
         # calculate elements' coordinates
         self._frames = []  # type: tp.List[EyesFrame]
+        # The viewport size of the most outer frame, kept for the duration of a check (see
+        # reset_frames_cache), so reading it from inside frames doesn't require extra round trips.
+        self._default_content_viewport_size = None  # type: tp.Optional[ViewPort]
         self.driver_takes_screenshot = driver.capabilities.get('takesScreenshot', False)
 
-        # Creating the rest of the driver interface by simply forwarding it to the underlying
-        # driver.
-        general_utils.create_proxy_interface(self, driver,
-                                             self._READONLY_PROPERTIES + self._SETTABLE_PROPERTIES)
-
-        for attr in self._READONLY_PROPERTIES:
-            if not hasattr(self.__class__, attr):
-                setattr(self.__class__, attr, general_utils.create_proxy_property(attr, 'driver'))
-        for attr in self._SETTABLE_PROPERTIES:
-            if not hasattr(self.__class__, attr):
-                setattr(self.__class__, attr, general_utils.create_proxy_property(attr, 'driver', True))
-
     def get_display_rotation(self):
         # type: () -> int
         """
@@ -227,9 +283,21 @@ class EyesWebDriver(object):
 
         :return: The rotation of the screenshot we get from the webdriver in (degrees).
         """
-        if self.platform_name == 'Android' and self.driver.orientation == "LANDSCAPE":
-            return -90
-        return 0
+        if self.platform_name != 'Android':
+            return 0
+        profile = eyes_selenium_utils.get_driver_profile(self)
+        if 'display_rotation' not in profile:
+            profile['display_rotation'] = -90 if self.driver.orientation == "LANDSCAPE" else 0
+        return profile['display_rotation']
+
+    @property
+    def orientation(self):
+        return self.driver.orientation
+
+    @orientation.setter
+    def orientation(self, value):
+        eyes_selenium_utils.invalidate_driver_profile(self, 'display_rotation', 'viewport_size')
+        self.driver.orientation = value
 
     def get_platform_name(self):
         return self.platform_name
@@ -266,15 +334,10 @@ class EyesWebDriver(object):
         caps = self.driver.capabilities
         return caps.get('browserName', caps.get('browser', None))
 
-    @cached_property
+    @property
     def user_agent(self):
-        try:
-            user_agent = self.driver.execute_script("return navigator.userAgent")
-            logger.info("user agent: {}".format(user_agent))
-        except Exception as e:
-            logger.info("Failed to obtain user-agent string")
-            user_agent = None
-        return user_agent
+        # type: () -> tp.Optional[tp.Text]
+        return eyes_selenium_utils.get_user_agent(self)
 
     def is_mobile_device(self):
         # type: () -> bool
@@ -293,8 +356,12 @@ class EyesWebDriver(object):
         :param url: The url to navigate to.
         :return: A driver that navigated to the given url.
         """
+        # The elements of pending triggers are gone once we navigate away.
+        # noinspection PyProtectedMember
+        self._eyes._resolve_user_inputs()
         # We're loading a new page, so the frame location resets
         self._frames = []  # type: tp.List[EyesFrame]
+        self.reset_frames_cache()
         return self.driver.get(url)
 
     def find_element(self, by=By.ID, value=None):
@@ -324,13 +391,8 @@ class EyesWebDriver(object):
         """
         # Get result from the original implementation of the underlying driver.
         results = self.driver.find_elements(by, value)
-        # Wrap all returned elements.
-        if results:
-            updated_results = []
-            for element in results:
-                updated_results.append(EyesWebElement(element, self._eyes, self))
-            results = updated_results
-        return results
+        # Wrap all returned elements. Wrapping doesn't talk to the browser, so it's cheap.
+        return [EyesWebElement(element, self._eyes, self) for element in results]
 
     def find_element_by_id(self, id_):
         # type: (tp.Text) -> EyesWebElement
@@ -565,6 +627,17 @@ class EyesWebDriver(object):
         """
         self._origin_position_provider.set_position(point)
 
+    def scroll_to_and_wait(self, point, seconds_to_wait):
+        # type: (Point, Num) -> Point
+        """
+        Commands the browser to scroll to a given position, and waits for the page to render it.
+
+        :param point: The point to scroll to.
+        :param seconds_to_wait: Seconds to wait after scrolling.
+        :return: The scroll position actually reached.
+        """
+        return self._origin_position_provider.set_position_and_report(point, seconds_to_wait)
+
     def get_entire_page_size(self):
         # type: () -> tp.Dict[tp.Text, int]
         """
@@ -605,31 +678,54 @@ class EyesWebDriver(object):
     def wait_for_page_load(self, timeout=3, throw_on_timeout=False):
         # type: (int, bool) -> None
         """
-        Waits for the current document to be "loaded".
+        Waits for the current document to be "loaded" (complete, with its fonts loaded and its
+        pending images decoded).
 
         :param timeout: The maximum time to wait, in seconds.
         :param throw_on_timeout: Whether to throw an exception when timeout is reached.
         """
+        try:
+            ready = eyes_selenium_utils.wait_for_page_ready(self.driver, timeout=timeout * 1000)[0]
+        except WebDriverException as e:
+            logger.debug("Failed to wait for the page in a single script: {}".format(e))
+            ready = self._wait_for_ready_state(timeout)
+        if not ready:
+            logger.debug('Page load timeout reached!')
+            if throw_on_timeout:
+                raise TimeoutException('Page load timeout reached!')
+
+    def _wait_for_ready_state(self, timeout):
+        # type: (int) -> bool
         # noinspection PyBroadException
         try:
             WebDriverWait(self.driver, timeout) \
                 .until(lambda driver: driver.execute_script('return document.readyState') == 'complete')
         except Exception:
-            logger.debug('Page load timeout reached!')
-            if throw_on_timeout:
-                raise
+            return False
+        return True
 
     def hide_scrollbars(self):
         # type: () -> tp.Text
         """
-        Hides the scrollbars of the current context's document element.
+        Hides the scrollbars of the current context's document element, once the page is loaded.
+        Both are done in a single round trip, and the overflow isn't changed if it's already hidden.
 
         :return: The previous value of the overflow property (could be None).
         """
         logger.debug('HideScrollbars() called. Waiting for page load...')
-        self.wait_for_page_load()
-        logger.debug('About to hide scrollbars')
-        return self.set_overflow('hidden')
+        try:
+            ready, original_overflow = eyes_selenium_utils.wait_for_page_ready(self.driver, 'hidden')
+        except WebDriverException as e:
+            logger.debug("Failed to wait for the page in a single script: {}".format(e))
+            self.wait_for_page_load()
+            logger.debug('About to hide scrollbars')
+            # This also cancels the wait, in case it's still pending in the browser.
+            return eyes_selenium_utils.hide_scrollbars(self.driver)
+        if not ready:
+            logger.debug('Page load timeout reached! About to hide scrollbars')
+            original_overflow = eyes_selenium_utils.hide_scrollbars(self.driver)
+        logger.debug("Original overflow: %s" % original_overflow)
+        return original_overflow
 
     def get_frame_chain(self):
         """
@@ -655,12 +751,21 @@ class EyesWebDriver(object):
 
         :return: The viewport size of the most outer frame.
         """
-        current_frames = self.get_frame_chain()
-        # If we're inside a frame, then we should first switch to the most outer frame.
-        self.switch_to.default_content()
-        viewport_size = self.get_viewport_size()
-        self.switch_to.frames(current_frames)
-        return viewport_size
+        if self._default_content_viewport_size is None:
+            current_frames = self.get_frame_chain()
+            # If we're inside a frame, then we should first switch to the most outer frame.
+            self.switch_to.default_content()
+            self._default_content_viewport_size = self.get_viewport_size()
+            self.switch_to.frames(current_frames)
+        return dict(self._default_content_viewport_size)
+
+    def reset_frames_cache(self):
+        # type: () -> None
+        """
+        Forgets the viewport size read so far. Called at the beginning of each check, since the
+        page might have changed since the previous one.
+        """
+        self._default_content_viewport_size = None
 
     def reset_origin(self):
         # type: () -> None
@@ -695,12 +800,285 @@ class EyesWebDriver(object):
         """
         self._position_provider.pop_state()
 
+    @staticmethod
+    def _create_stitching_canvas(region, pixel_ratio):
+        # type: (Region, float) -> Image.Image
+        """
+        Creates an image for stitching unscaled screenshot parts of the given region.
+        """
+        return Image.new('RGBA', (int(math.ceil(region.width * pixel_ratio)),
+                                  int(math.ceil(region.height * pixel_ratio))))
+
+    @staticmethod
+    def _stitching_offset(position, pixel_ratio):
+        # type: (Point, float) -> tp.Tuple[int, int]
+        """
+        Returns the location on the stitching canvas of a part captured at the given position.
+        """
+        return int(round(position.x * pixel_ratio)), int(round(position.y * pixel_ratio))
+
+    def _scale_stitched_image(self, stitched_image, region, pixel_ratio):
+        # type: (Image.Image, Region, float) -> Image.Image
+        """
+        Scales the stitched image to the size of the region it represents.
+        """
+        if pixel_ratio == 1.0:
+            return stitched_image
+        stitched_image = image_utils.scale_image(stitched_image, 1.0 / pixel_ratio, self._eyes.scale_resample)
+        if stitched_image.size != (region.width, region.height):
+            stitched_image = stitched_image.crop((0, 0, region.width, region.height))
+        return stitched_image
+
     @staticmethod
     def _wait_before_screenshot(seconds):
         logger.debug("Waiting {} ms before taking screenshot..".format(int(seconds * 1000)))
         time.sleep(seconds)
         logger.debug("Finished waiting!")
 
+    @property
+    def stitching_costs(self):
+        # type: () -> tp.Optional[tp.Dict[tp.Text, tp.Optional[float]]]
+        """
+        The costs (in seconds) of scrolling, CSS translation, resizing and taking a screenshot, as
+        measured for StitchMode.Auto. The resize cost is None if the browser can't be resized to fit a page.
+        """
+        return self._stitching_costs
+
+    @property
+    def effective_stitch_mode(self):
+        # type: () -> tp.Optional[tp.Text]
+        """
+        The stitch mode used for the last full page screenshot (the one chosen, for StitchMode.Auto).
+        """
+        return self._effective_stitch_mode
+
+    def _measure_stitching_costs(self, entire_page_size, part_height):
+        # type: (ViewPort, int) -> tp.Dict[tp.Text, tp.Optional[float]]
+        """
+        Times moving to the next part and back by scrolling and by CSS translation, a screenshot and
+        (for headless browsers) resizing the window and back.
+        """
+        capabilities = self.driver.capabilities
+        is_headless = eyes_selenium_utils.is_headless_browser(self)
+        browser = (capabilities.get('browserName'), capabilities.get('browserVersion', capabilities.get('version')),
+                   is_headless)
+        costs = self._stitching_costs_cache.get(browser)
+        if costs is not None:
+            return costs
+
+        # Moving to where the next part would be (if the page is that long) and back.
+        next_part = Point(0, max(min(part_height, entire_page_size['height'] - part_height), 0))
+        start = time.time()
+        self._origin_position_provider.set_position_and_report(next_part)
+        self._origin_position_provider.set_position_and_report(Point(0, 0))
+        scroll_cost = (time.time() - start) / 2
+
+        css_cost = self._measure_css_translate_cost(next_part)
+
+        start = time.time()
+        image_utils.image_from_bytes(base64.b64decode(self.get_screenshot_as_base64()))
+        screenshot_cost = time.time() - start
+
+        resize_cost = None
+        if is_headless and not eyes_selenium_utils.is_mobile_device(self):
+            resize_cost = self._measure_resize_cost(part_height)
+
+        costs = dict(scroll=scroll_cost, css=css_cost, screenshot=screenshot_cost, resize=resize_cost)
+        logger.info("Stitching costs for {}: {}".format(browser, costs))
+        self._stitching_costs_cache[browser] = costs
+        return costs
+
+    def _measure_css_translate_cost(self, next_part):
+        # type: (Point) -> tp.Optional[float]
+        """
+        :return: The time it takes to translate the page to the next part and back, or None if it failed.
+        """
+        css_position_provider = CSSTranslatePositionProvider(self.driver)
+        # noinspection PyBroadException
+        try:
+            css_position_provider.push_state()
+        except Exception as e:
+            logger.info("Failed to measure the cost of CSS stitching: {}".format(e))
+            return None
+        css_cost = None
+        # noinspection PyBroadException
+        try:
+            start = time.time()
+            css_position_provider.set_position_and_report(next_part)
+            css_position_provider.set_position_and_report(Point(0, 0))
+            css_cost = (time.time() - start) / 2
+        except Exception as e:
+            logger.info("Failed to measure the cost of CSS stitching: {}".format(e))
+        # Putting back the page's transform, even if translating it failed half way.
+        # noinspection PyBroadException
+        try:
+            css_position_provider.pop_state()
+        except Exception as e:
+            logger.info("Failed to restore the page's transform: {}".format(e))
+            return None
+        return css_cost
+
+    def _measure_resize_cost(self, part_height):
+        # type: (int) -> tp.Optional[float]
+        """
+        :return: The time it takes to make the window one part taller, or None if it failed.
+        """
+        # noinspection PyBroadException
+        try:
+            window_size = eyes_selenium_utils.get_window_size(self)
+        except Exception as e:
+            logger.info("Failed to measure the cost of resize stitching: {}".format(e))
+            return None
+        resize_cost = None
+        # noinspection PyBroadException
+        try:
+            taller_window_size = dict(width=window_size['width'], height=window_size['height'] + part_height)
+            start = time.time()
+            if eyes_selenium_utils.set_browser_size(self, taller_window_size):
+                resize_cost = time.time() - start
+        except Exception as e:
+            logger.info("Failed to measure the cost of resize stitching: {}".format(e))
+        # Putting back the window's size, even if resizing it failed half way.
+        # noinspection PyBroadException
+        try:
+            eyes_selenium_utils.set_browser_size(self, window_size)
+        except Exception as e:
+            logger.info("Failed to restore the window's size: {}".format(e))
+            return None
+        return resize_cost
+
+    def _choose_stitch_mode(self, entire_page_size, wait_before_screenshots):
+        # type: (ViewPort, Num) -> tp.Text
+        """
+        Chooses the stitch mode expected to capture a page of the given size the fastest.
+        """
+        viewport_size = self.get_viewport_size()
+        part_height = max(viewport_size['height'] - self._MAX_SCROLL_BAR_SIZE, self._MIN_SCREENSHOT_PART_HEIGHT)
+        if self._stitching_costs is None:
+            self._stitching_costs = self._measure_stitching_costs(entire_page_size, part_height)
+        costs = self._stitching_costs
+        columns = int(math.ceil(float(entire_page_size['width']) / viewport_size['width']))
+        rows = int(math.ceil(float(entire_page_size['height']) / part_height))
+        parts_count = columns * rows
+        part_capture_cost = costs['screenshot'] + wait_before_screenshots
+
+        expected_costs = [(parts_count * (costs['scroll'] + part_capture_cost), StitchMode.Scroll)]
+        if costs['css'] is not None:
+            expected_costs.append((parts_count * (costs['css'] + part_capture_cost), StitchMode.CSS))
+        if costs['resize'] is not None:
+            # The window is resized twice (and restored), and the screenshot is as large as the page.
+            page_area = entire_page_size['width'] * entire_page_size['height']
+            viewports_count = max(float(page_area) / (viewport_size['width'] * viewport_size['height']), 1)
+            resize_cost = 2 * costs['resize'] + wait_before_screenshots + viewports_count * costs['screenshot']
+            expected_costs.append((resize_cost, StitchMode.Resize))
+        expected_cost, stitch_mode = min(expected_costs)
+        logger.info("Expected capture costs for {} parts: {}. Using {} stitching.".format(
+            parts_count, ', '.join('{}: {:.3f}s'.format(mode, cost) for cost, mode in expected_costs), stitch_mode))
+        return stitch_mode
+
+    def _get_full_page_screenshot_by_resize(self, entire_page_size, wait_before_screenshots, scale_provider):
+        # type: (ViewPort, Num, ScaleProvider) -> tp.Optional[Image.Image]
+        """
+        Takes a full page screenshot in a single capture, by temporarily resizing the browser window
+        so the viewport fits the entire page. The original window size is restored afterwards.
+
+        :param entire_page_size: The size of the page to capture.
+        :param wait_before_screenshots: Seconds to wait before taking the screenshot.
+        :return: The scaled full page screenshot, or None if the window couldn't be resized to fit the page.
+        """
+        if eyes_selenium_utils.is_mobile_device(self):
+            logger.info("Can't resize the window of a mobile device, using scrolling instead.")
+            return None
+        original_window_size = eyes_selenium_utils.get_window_size(self)
+        viewport_size = self.get_viewport_size()
+        required_window_size = dict(
+            width=original_window_size['width'] + entire_page_size['width'] - viewport_size['width'],
+            height=original_window_size['height'] + entire_page_size['height'] - viewport_size['height'])
+        try:
+            if not eyes_selenium_utils.set_browser_size(self, required_window_size):
+                logger.info("Couldn't resize the window to fit the page, using scrolling instead.")
+                return None
+            # The page might have changed its size along with the viewport (e.g, "vh" units).
+            entire_page_size = self.get_entire_page_size()
+            EyesWebDriver._wait_before_screenshot(wait_before_screenshots)
+            screenshot64 = self.get_screenshot_as_base64()
+        finally:
+            eyes_selenium_utils.set_browser_size(self, original_window_size)
+
+        screenshot = image_utils.image_from_bytes(base64.b64decode(screenshot64))
+        scale_provider.update_scale_ratio(screenshot.width)
+        screenshot = image_utils.scale_image(screenshot, scale_provider.scale_ratio, self._eyes.scale_resample)
+        if screenshot.width < entire_page_size['width'] or screenshot.height < entire_page_size['height']:
+            logger.info("Screenshot {} doesn't cover the page {}, using scrolling instead.".format(
+                screenshot.size, entire_page_size))
+            return None
+        return screenshot.crop((0, 0, entire_page_size['width'], entire_page_size['height']))
+
+    def _stitch_vertically(self, screenshot, entire_page, position_provider, pixel_ratio, wait_before_screenshots,
+                           parts):
+        # type: (Image.Image, Region, PositionProvider, float, Num, tp.List[_StitchedPart]) -> Image.Image
+        """
+        Stitches a page as wide as the viewport from full viewport height parts. The actual offset between
+        consecutive parts is measured by matching their rows, and sticky headers and footers are detected
+        so they're only stitched once.
+
+        :param screenshot: The (unscaled) screenshot of the top of the page.
+        :param entire_page: The region of the entire page.
+        :param position_provider: The position provider used for moving between parts.
+        :param wait_before_screenshots: Seconds to wait before taking each screenshot.
+        :param parts: The list to which the stitched parts are added.
+        :return: The stitched (unscaled) image.
+        """
+        stitched_image = self._create_stitching_canvas(entire_page, pixel_ratio)
+        stitched_image.paste(screenshot, box=(0, 0))
+
+        height = screenshot.height
+        viewport_height = int(math.ceil(height / pixel_ratio))
+        overlap = int(round(self._MIN_STITCH_OVERLAP * pixel_ratio))
+        # Scroll bars move between parts, so they're excluded when comparing rows.
+        rows_width = max(screenshot.width - int(self._MAX_SCROLL_BAR_SIZE * pixel_ratio), 1)
+
+        previous_rows = image_utils.get_row_hashes(screenshot, rows_width)
+        previous_position = Point(0, 0)
+        previous_top = 0
+        step = max(viewport_height - self._MIN_STITCH_OVERLAP, self._MIN_SCREENSHOT_PART_HEIGHT)
+        # Scrolling stops at the end of the page by itself, but CSS translation doesn't.
+        max_y = max(entire_page.height - viewport_height, 0)
+        parts_count = 1
+        while previous_position.y + viewport_height < entire_page.height:
+            position = position_provider.set_position_and_report(Point(0, min(previous_position.y + step, max_y)),
+                                                                 wait_before_screenshots)
+            position = Point(position.x, min(position.y, max_y))
+            if position.y <= previous_position.y:
+                logger.debug("Couldn't move past {}, stopping.".format(previous_position))
+                break
+            part_image = image_utils.image_from_bytes(base64.b64decode(self.get_screenshot_as_base64()))
+            parts_count += 1
+            rows = image_utils.get_row_hashes(part_image, rows_width)
+            top, bottom = image_utils.find_sticky_rows(previous_rows, rows, height // 3)
+            expected_offset = int(round((position.y - previous_position.y) * pixel_ratio))
+            offset = image_utils.find_vertical_offset(previous_rows, rows, expected_offset, overlap, top, bottom)
+            content_height = height - top - bottom
+            next_step = max(int((content_height - overlap) / pixel_ratio), self._MIN_SCREENSHOT_PART_HEIGHT)
+            logger.debug("Part at {}: offset {} (expected {}), sticky rows {}/{}".format(
+                position, offset, expected_offset, top, bottom))
+            if offset > content_height and next_step < step:
+                # Sticky elements hid content which neither part captured, so move less.
+                step = next_step
+                continue
+
+            part_top = previous_top + offset
+            is_last = position.y + viewport_height >= entire_page.height
+            # The footer of the last part is kept, since that's where it's shown at the end of the page.
+            crop_box = (0, top, part_image.width, height if is_last else height - bottom)
+            stitched_image.paste(part_image.crop(crop_box), box=(0, part_top + top))
+            parts.append((position, crop_box, (0, part_top + top)))
+
+            previous_rows, previous_position, previous_top = rows, position, part_top
+            step = next_step
+        logger.debug("Stitched {} parts.".format(parts_count))
+        return stitched_image
+
     def get_full_page_screenshot(self, wait_before_screenshots, scale_provider):
         # type: (Num, ScaleProvider) -> Image.Image
         """
@@ -715,10 +1093,48 @@ class EyesWebDriver(object):
         original_frame = self.get_frame_chain()
         self.switch_to.default_content()
 
+        if self._eyes.load_lazy_content:
+            eyes_selenium_utils.load_lazy_content(self)
         self.reset_origin()
+        try:
+            return self._get_full_page_screenshot(wait_before_screenshots, scale_provider)
+        finally:
+            self.restore_origin()
+            self.switch_to.frames(original_frame)
 
+    def _get_full_page_screenshot(self, wait_before_screenshots, scale_provider):
+        # type: (Num, ScaleProvider) -> Image.Image
         entire_page_size = self.get_entire_page_size()
 
+        stitch_mode = self._stitch_mode
+        if stitch_mode == StitchMode.Auto:
+            stitch_mode = self._choose_stitch_mode(entire_page_size, wait_before_screenshots)
+        self._effective_stitch_mode = stitch_mode
+        # Parts are moved to by scrolling in StitchMode.CSS too, unless translating them was asked for
+        # (or chosen by StitchMode.Auto).
+        translate_parts = self._stitch_mode == StitchMode.Auto or self._eyes.translate_stitched_parts
+        if stitch_mode == StitchMode.CSS and translate_parts:
+            stitching_position_provider = CSSTranslatePositionProvider(self.driver)
+        else:
+            stitching_position_provider = self._origin_position_provider
+
+        if stitch_mode == StitchMode.Resize:
+            self._stitched_page = None
+            screenshot = self._get_full_page_screenshot_by_resize(entire_page_size, wait_before_screenshots,
+                                                                  scale_provider)
+            if screenshot is not None:
+                return screenshot
+        elif self._eyes.reuse_unchanged_parts:
+            stitched_image = self._recapture_changed_parts(entire_page_size, stitching_position_provider,
+                                                           wait_before_screenshots)
+            if stitched_image is not None:
+                return self._scale_stitched_image(stitched_image, self._stitched_page.region,
+                                                  self._stitched_page.pixel_ratio)
+
+        if self._eyes.reuse_unchanged_parts:
+            # Changes made while the parts are captured are recorded too, so those parts are recaptured later.
+            eyes_selenium_utils.track_dirty_bands(self)
+
         # Starting with the screenshot at 0,0
         EyesWebDriver._wait_before_screenshot(wait_before_screenshots)
         part64 = self.get_screenshot_as_base64()
@@ -726,35 +1142,62 @@ class EyesWebDriver(object):
 
         scale_provider.update_scale_ratio(screenshot.width)
         pixel_ratio = 1.0 / scale_provider.scale_ratio
-        need_to_scale = True if pixel_ratio != 1.0 else False
-        if need_to_scale:
-            screenshot = image_utils.scale_image(screenshot, 1.0 / pixel_ratio)
+        # The parts are stitched unscaled, and the stitched image is scaled once at the end.
+        scaled_width = int(math.ceil(screenshot.width / pixel_ratio))
+        scaled_height = int(math.ceil(screenshot.height / pixel_ratio))
+        # The position of each part, the box cropped out of its screenshot and where it was pasted.
+        parts = [(Point(0, 0), (0, 0, screenshot.width, screenshot.height), (0, 0))]
 
         # IMPORTANT This is required! Since when calculating the screenshot parts for full size,
         # we use a screenshot size which is a bit smaller (see comment below).
-        if (screenshot.width >= entire_page_size['width']) and \
-                (screenshot.height >= entire_page_size['height']):
-            self.restore_origin()
-            self.switch_to.frames(original_frame)
-
-            return screenshot
+        if (scaled_width >= entire_page_size['width']) and \
+                (scaled_height >= entire_page_size['height']):
+            self._remember_stitched_page(screenshot, Region(0, 0, scaled_width, scaled_height), entire_page_size,
+                                         pixel_ratio, stitch_mode, parts)
+            return image_utils.scale_image(screenshot, 1.0 / pixel_ratio, self._eyes.scale_resample)
 
+        entire_page = Region(0, 0, entire_page_size['width'], entire_page_size['height'])
+        stitching_position_provider.push_state()
+        try:
+            if self._eyes.detect_stitching_overlap and scaled_width >= entire_page_size['width']:
+                stitched_image = self._stitch_vertically(screenshot, entire_page, stitching_position_provider,
+                                                         pixel_ratio, wait_before_screenshots, parts)
+            else:
+                stitched_image = self._stitch_grid(screenshot, entire_page, stitching_position_provider,
+                                                   pixel_ratio, wait_before_screenshots, parts)
+        finally:
+            stitching_position_provider.pop_state()
+        self._remember_stitched_page(stitched_image, entire_page, entire_page_size, pixel_ratio, stitch_mode, parts)
+        return self._scale_stitched_image(stitched_image, entire_page, pixel_ratio)
+
+    def _stitch_grid(self, screenshot, entire_page, position_provider, pixel_ratio, wait_before_screenshots,
+                     parts):
+        # type: (Image.Image, Region, PositionProvider, float, Num, tp.List[_StitchedPart]) -> Image.Image
+        """
+        Stitches a page from a grid of parts slightly smaller than the viewport.
+
+        :param screenshot: The (unscaled) screenshot of the top left of the page.
+        :param entire_page: The region of the entire page.
+        :param position_provider: The position provider used for moving between parts.
+        :param wait_before_screenshots: Seconds to wait before taking each screenshot.
+        :param parts: The list to which the stitched parts are added.
+        :return: The stitched (unscaled) image.
+        """
         #  We use a smaller size than the actual screenshot size in order to eliminate duplication
         #  of bottom scroll bars, as well as footer-like elements with fixed position.
-        screenshot_part_size = {'width': screenshot.width,
-                                'height': max(screenshot.height - self._MAX_SCROLL_BAR_SIZE,
+        scaled_height = int(math.ceil(screenshot.height / pixel_ratio))
+        screenshot_part_size = {'width': int(math.ceil(screenshot.width / pixel_ratio)),
+                                'height': max(scaled_height - self._MAX_SCROLL_BAR_SIZE,
                                               self._MIN_SCREENSHOT_PART_HEIGHT)}
 
-        logger.debug("Total size: {0}, Screenshot part size: {1}".format(entire_page_size,
+        logger.debug("Total size: {0}, Screenshot part size: {1}".format(entire_page.size,
                                                                          screenshot_part_size))
 
-        entire_page = Region(0, 0, entire_page_size['width'], entire_page_size['height'])
         screenshot_parts = entire_page.get_sub_regions(screenshot_part_size)
 
         # Starting with the screenshot we already captured at (0,0).
-        stitched_image = Image.new('RGBA', (entire_page.width, entire_page.height))
+        stitched_image = self._create_stitching_canvas(entire_page, pixel_ratio)
         stitched_image.paste(screenshot, box=(0, 0))
-        self.save_position()
 
         for part in screenshot_parts:
             # Since we already took the screenshot for 0,0
@@ -762,25 +1205,68 @@ class EyesWebDriver(object):
                 logger.debug('Skipping screenshot for 0,0 (already taken)')
                 continue
             logger.debug("Taking screenshot for {0}".format(part))
-            # Scroll to the part's top/left and give it time to stabilize.
-            self.scroll_to(Point(part.left, part.top))
-            EyesWebDriver._wait_before_screenshot(wait_before_screenshots)
-            # Since screen size might cause the scroll to reach only part of the way
-            current_scroll_position = self.get_current_position()
+            # Move to the part's top/left and give it time to stabilize. Since screen size might
+            # cause the scroll to reach only part of the way, we use the position actually reached.
+            current_scroll_position = position_provider.set_position_and_report(
+                Point(part.left, part.top), wait_before_screenshots)
             logger.debug("Scrolled To ({0},{1})".format(current_scroll_position.x,
                                                         current_scroll_position.y))
             part64 = self.get_screenshot_as_base64()
             part_image = image_utils.image_from_bytes(base64.b64decode(part64))
 
-            if need_to_scale:
-                part_image = image_utils.scale_image(part_image, 1.0 / pixel_ratio)
+            offset = self._stitching_offset(current_scroll_position, pixel_ratio)
+            stitched_image.paste(part_image, box=offset)
+            parts.append((current_scroll_position, (0, 0, part_image.width, part_image.height), offset))
+        return stitched_image
 
-            stitched_image.paste(part_image, box=(current_scroll_position.x, current_scroll_position.y))
+    def _remember_stitched_page(self, image, region, entire_page_size, pixel_ratio, stitch_mode, parts):
+        # type: (Image.Image, Region, ViewPort, float, tp.Text, tp.List[_StitchedPart]) -> None
+        """
+        Keeps the stitched page so its unchanged parts can be reused (the page's changes are tracked
+        since before its first part was captured).
+        """
+        if not self._eyes.reuse_unchanged_parts:
+            return
+        self._stitched_page = _StitchedPage(image, region, entire_page_size, self.get_viewport_size(),
+                                            pixel_ratio, stitch_mode, parts)
 
-        self.restore_position()
-        self.restore_origin()
-        self.switch_to.frames(original_frame)
+    def _recapture_changed_parts(self, entire_page_size, position_provider, wait_before_screenshots):
+        # type: (ViewPort, PositionProvider, Num) -> tp.Optional[Image.Image]
+        """
+        Updates the previously stitched page by recapturing only the parts which show changed content.
 
+        :return: The (unscaled) stitched image, or None if the page has to be captured from scratch (e.g.,
+                 it was navigated away from, or its layout changed).
+        """
+        page = self._stitched_page
+        if (page is None or page.entire_page_size != entire_page_size or page.stitch_mode != self._effective_stitch_mode
+                or page.viewport_size != self.get_viewport_size()):
+            return None
+        # Changes made from now on (including while recapturing) are recorded for the next time.
+        dirty_bands = eyes_selenium_utils.take_dirty_bands(self)
+        if dirty_bands is None:
+            return None
+
+        stitched_image = page.image.copy()
+        recaptured = 0
+        position_provider.push_state()
+        try:
+            for position, crop_box, paste_point in page.parts:
+                top = paste_point[1] / page.pixel_ratio
+                bottom = (paste_point[1] + crop_box[3] - crop_box[1]) / page.pixel_ratio
+                if not any(band_top < bottom and band_bottom > top for band_top, band_bottom in dirty_bands):
+                    continue
+                reached = position_provider.set_position_and_report(position, wait_before_screenshots)
+                if (reached.x, reached.y) != (position.x, position.y):
+                    logger.info("Couldn't return to the part at {}, capturing the page again.".format(position))
+                    return None
+                part_image = image_utils.image_from_bytes(base64.b64decode(self.get_screenshot_as_base64()))
+                stitched_image.paste(part_image.crop(crop_box), box=paste_point)
+                recaptured += 1
+        finally:
+            position_provider.pop_state()
+        logger.info("Recaptured {} of {} parts of the page.".format(recaptured, len(page.parts)))
+        page.image = stitched_image
         return stitched_image
 
     def get_stitched_screenshot(self, element, wait_before_screenshots, scale_provider):
@@ -794,6 +1280,9 @@ class EyesWebDriver(object):
         logger.info('getting stitched element screenshot..')
 
         self._position_provider = ElementPositionProvider(self.driver, element)
+        # The element's metrics might be left from an earlier check or attempt, and the page might
+        # have changed since.
+        element.reset_metrics()
         entire_size = self._position_provider.get_entire_size()
 
         #  We use a smaller size than the actual screenshot size in order to eliminate duplication
@@ -804,14 +1293,15 @@ class EyesWebDriver(object):
         # in the safari browser the returned size has absolute value but not relative as
         # in other browsers
 
-        origin_overflow = element.get_overflow()
-        element.set_overflow('hidden')
+        # Setting the overflow also refreshes the element's metrics, so the sizes and borders below
+        # don't need round trips of their own.
+        origin_overflow = element.set_overflow('hidden')
 
         element_width = element.get_client_width()
         element_height = element.get_client_height()
 
-        border_left_width = element.get_computed_style_int('border-left-width')
-        border_top_width = element.get_computed_style_int('border-top-width')
+        border_left_width = element.get_border_left_width()
+        border_top_width = element.get_border_top_width()
         element_region = Region(pl['x'] + border_left_width,
                                 pl['y'] + border_top_width,
                                 element_width, element_height)
@@ -841,14 +1331,13 @@ class EyesWebDriver(object):
             element_region = element_region.scale(scale_provider.device_pixel_ratio)
 
         # Starting with element region size part of the screenshot. Use it as a size template.
-        stitched_image = Image.new('RGBA', (entire_element.width, entire_element.height))
+        stitched_image = self._create_stitching_canvas(entire_element, pixel_ratio)
         for part in screenshot_parts:
             logger.debug("Taking screenshot for {0}".format(part))
-            # Scroll to the part's top/left and give it time to stabilize.
-            self._position_provider.set_position(Point(part.left, part.top))
-            EyesWebDriver._wait_before_screenshot(wait_before_screenshots)
-            # Since screen size might cause the scroll to reach only part of the way
-            current_scroll_position = self._position_provider.get_current_position()
+            # Scroll to the part's top/left and give it time to stabilize. Since screen size might
+            # cause the scroll to reach only part of the way, we use the position actually reached.
+            current_scroll_position = self._position_provider.set_position_and_report(Point(part.left, part.top),
+                                                                                      wait_before_screenshots)
             logger.debug("Scrolled To ({0},{1})".format(current_scroll_position.x,
                                                         current_scroll_position.y))
             part64 = self.get_screenshot_as_base64()
@@ -864,53 +1353,82 @@ class EyesWebDriver(object):
                                                                                width=viewport['width']))
             # We cut original image before scaling to prevent appearing of artifacts
             part_image = image_utils.get_image_part(part_image, element_region)
-            if need_to_scale:
-                part_image = image_utils.scale_image(part_image, 1.0 / pixel_ratio)
 
             # first iteration
             if stitched_image is None:
                 stitched_image = part_image
                 continue
-            stitched_image.paste(part_image, box=(current_scroll_position.x, current_scroll_position.y))
+            stitched_image.paste(part_image, box=self._stitching_offset(current_scroll_position, pixel_ratio))
 
         if origin_overflow:
             element.set_overflow(origin_overflow)
 
-        return stitched_image
+        return self._scale_stitched_image(stitched_image, entire_element, pixel_ratio)
+
+    def _get_frame_metadata_and_scroll(self, frame_element, parent_scroll_position=None):
+        # type: (AnyWebElement, tp.Optional[Point]) -> tp.Tuple[dict, dict, Point]
+        """
+        Restores the parent's scroll position (if given), reads the location (including borders) and
+        size of a frame and the current scroll position, and scrolls to the frame.
 
-    def _will_switch_to(self, frame_reference, frame_element=None):
-        # type: (tp.Optional[FrameReference], AnyWebElement) -> None
+        :param frame_element: The frame element instance.
+        :param parent_scroll_position: The scroll position to restore first (optional).
+        :return: The frame's location, its size and the scroll position before scrolling.
+        """
+        element = frame_element.element if isinstance(frame_element, EyesWebElement) else frame_element
+        restored_position = None
+        if parent_scroll_position is not None:
+            restored_position = [parent_scroll_position.x, parent_scroll_position.y]
+        try:
+            left, top, width, height, x, y = scripts.execute_script(self, self._JS_GET_FRAME_METADATA_AND_SCROLL,
+                                                                    element, restored_position)
+            return {'x': left, 'y': top}, {'width': width, 'height': height}, Point(x, y)
+        except WebDriverException:
+            logger.debug("Failed to read the frame's metadata with a single script, reading it one by one.")
+        if parent_scroll_position is not None:
+            self.scroll_to(parent_scroll_position)
+        frame_location = frame_element.location
+        frame_size = frame_element.size
+        parent_scroll_position = self.get_current_position()
+        # Frame border can affect location calculation for elements.
+        # noinspection PyBroadException
+        try:
+            frame_left_border_width = int(frame_element
+                                          .value_of_css_property('border-left-width')
+                                          .rstrip('px'))
+            frame_top_border_width = int(frame_element.value_of_css_property('border-top-width')
+                                         .rstrip('px'))
+        except Exception:
+            frame_left_border_width = 0
+            frame_top_border_width = 0
+        frame_location['x'] += frame_left_border_width
+        frame_location['y'] += frame_top_border_width
+        self.scroll_to(Point(frame_location['x'], frame_location['y']))
+        return frame_location, frame_size, parent_scroll_position
+
+    def _will_switch_to(self, frame_reference, frame_element=None, parent_scroll_position=None):
+        # type: (tp.Optional[FrameReference], AnyWebElement, tp.Optional[Point]) -> None
         """
         Updates the current webdriver that a switch was made to a frame element.
 
         :param frame_reference: The reference to the frame.
         :param frame_element: The frame element instance.
+        :param parent_scroll_position: The scroll position of the parent frame to restore and record,
+                                       if it's already known (e.g., when switching back into a frame
+                                       chain).
         """
+        # The elements of pending triggers can only be read from the frame they were recorded in.
+        # noinspection PyProtectedMember
+        self._eyes._resolve_user_inputs()
         if frame_element is not None:
-            frame_location = frame_element.location
-            frame_size = frame_element.size
-            frame_id = frame_element.id
-            parent_scroll_position = self.get_current_position()
-            # Frame border can affect location calculation for elements.
-            # noinspection PyBroadException
-            try:
-                frame_left_border_width = int(frame_element
-                                              .value_of_css_property('border-left-width')
-                                              .rstrip('px'))
-                frame_top_border_width = int(frame_element.value_of_css_property('border-top-width')
-                                             .rstrip('px'))
-            except Exception:
-                frame_left_border_width = 0
-                frame_top_border_width = 0
-            frame_location['x'] += frame_left_border_width
-            frame_location['y'] += frame_top_border_width
-
             # We need to scroll position to top of the frame to be able to take a correct screenshot
             # in the get_stitched_screenshot  method
-            self.scroll_to(Point(frame_location['x'], frame_location['y']))
-
-            self._frames.append(EyesFrame(frame_reference, frame_location, frame_size, frame_id,
-                                          parent_scroll_position))
+            frame_location, frame_size, current_scroll_position = \
+                self._get_frame_metadata_and_scroll(frame_element, parent_scroll_position)
+            if parent_scroll_position is None:
+                parent_scroll_position = current_scroll_position
+            self._frames.append(EyesFrame(frame_reference, frame_location, frame_size,
+                                          frame_element.id, parent_scroll_position.clone()))
         elif frame_reference == _EyesSwitchTo.PARENT_FRAME:
             self._frames.pop()
         else:
@@ -940,7 +1458,20 @@ class EyesWebDriver(object):
         return self.driver.get_window_size(windowHandle)
 
     def set_window_size(self, width, height, windowHandle='current'):
+        eyes_selenium_utils.invalidate_driver_profile(self, 'viewport_size')
         self.driver.set_window_size(width, height, windowHandle)
 
+    def set_window_rect(self, x=None, y=None, width=None, height=None):
+        eyes_selenium_utils.invalidate_driver_profile(self, 'viewport_size')
+        return self.driver.set_window_rect(x, y, width, height)
+
+    def maximize_window(self):
+        eyes_selenium_utils.invalidate_driver_profile(self, 'viewport_size')
+        self.driver.maximize_window()
+
+    def fullscreen_window(self):
+        eyes_selenium_utils.invalidate_driver_profile(self, 'viewport_size')
+        self.driver.fullscreen_window()
+
     def set_window_position(self, x, y, windowHandle='current'):
         self.driver.set_window_position(x, y, windowHandle)
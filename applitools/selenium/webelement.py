@@ -8,7 +8,7 @@ from selenium.webdriver.common.by import By
 
 from ..core.geometry import Region
 from ..core import logger
-from ..utils import general_utils
+from ..utils import general_utils, scripts
 
 if tp.TYPE_CHECKING:
     from selenium.webdriver.remote.webelement import WebElement
@@ -26,11 +26,9 @@ class EyesWebElement(object):
     """
     _METHODS_TO_REPLACE = ['find_element', 'find_elements']
 
-    # Properties require special handling since even testing if they're callable "activates"
-    # them, which makes copying them automatically a problem.
-    _READONLY_PROPERTIES = ['tag_name', 'text', 'location_once_scrolled_into_view',
-                            'parent', 'rect', 'screenshot_as_base64', 'screenshot_as_png',
-                            'location_in_view', 'anonymous_children']
+    # The rest of the web element's interface is forwarded to the underlying element.
+    __getattr__ = general_utils.create_forwarding_getattr('element')
+
     _JS_GET_COMPUTED_STYLE_FORMATTED_STR = """
             var elem = arguments[0];
             var styleProp = '%s';
@@ -55,6 +53,21 @@ class EyesWebElement(object):
             arguments[0].scrollLeft = {:d};
             arguments[0].scrollTop = {:d};
     """
+    # Everything the getters below read, in the order of _METRICS_KEYS, collected by a single script.
+    _METRICS_KEYS = ('scroll_left', 'scroll_top', 'scroll_width', 'scroll_height', 'client_width',
+                     'client_height', 'border-left-width', 'border-top-width', 'border-right-width',
+                     'border-bottom-width', 'overflow')
+    # The metrics which are computed styles (the overflow in the metrics is the element's inline style).
+    _COMPUTED_STYLE_METRICS_KEYS = ('border-left-width', 'border-top-width', 'border-right-width',
+                                    'border-bottom-width')
+    _JS_COLLECT_METRICS = scripts.minify("""
+            var style = window.getComputedStyle ? window.getComputedStyle(elem, null) : elem.currentStyle;
+            var metrics = [elem.scrollLeft, elem.scrollTop, elem.scrollWidth, elem.scrollHeight,
+                           elem.clientWidth, elem.clientHeight, style.borderLeftWidth, style.borderTopWidth,
+                           style.borderRightWidth, style.borderBottomWidth, elem.style.overflow];
+    """) + "\n"
+    _JS_GET_METRICS = scripts.register('elementMetrics',
+                                       "var elem = arguments[0];\n" + _JS_COLLECT_METRICS + "return metrics;")
 
     def __init__(self, element, eyes, driver):
         # type: (WebElement, Eyes, EyesWebDriver) -> None
@@ -68,6 +81,8 @@ class EyesWebElement(object):
         self.element = element
         self._eyes = eyes
         self._driver = driver  # type: AnyWebDriver
+        # The element's metrics snapshot, kept until we scroll the element or change its overflow.
+        self._metrics = None  # type: tp.Optional[tp.Dict[tp.Text, tp.Any]]
         # Replacing implementation of the underlying driver with ours. We'll put the original
         # methods back before destruction.
         self._original_methods = {}  # type: tp.Dict[tp.Text, tp.Callable]
@@ -75,12 +90,6 @@ class EyesWebElement(object):
             self._original_methods[method_name] = getattr(element, method_name)
             setattr(element, method_name, getattr(self, method_name))
 
-        # Copies the web element's interface
-        general_utils.create_proxy_interface(self, element, self._READONLY_PROPERTIES)
-        # Setting properties
-        for attr in self._READONLY_PROPERTIES:
-            setattr(self.__class__, attr, general_utils.create_proxy_property(attr, 'element'))
-
     @property
     def bounds(self):
         # type: () -> Region
@@ -142,19 +151,15 @@ class EyesWebElement(object):
         """
         # Get result from the original implementation of the underlying driver.
         results = self._original_methods['find_elements'](by, value)
-        # Wrap all returned elements.
-        if results:
-            updated_results = []
-            for element in results:
-                updated_results.append(EyesWebElement(element, self._eyes, self._driver))
-            results = updated_results
-        return results
+        # Wrap all returned elements. Wrapping doesn't talk to the browser, so it's cheap.
+        return [EyesWebElement(element, self._eyes, self._driver) for element in results]
 
     def click(self):
         """
         Clicks and element.
         """
         self._eyes.add_mouse_trigger_by_element('click', self)
+        self.reset_metrics()
         self.element.click()
 
     def send_keys(self, *value):
@@ -169,6 +174,7 @@ class EyesWebElement(object):
                 val = val.__str__()
             text += val.encode('utf-8').decode('utf-8')
         self._eyes.add_text_trigger_by_element(self, text)
+        self.reset_metrics()
         self.element.send_keys(*value)
 
     def set_overflow(self, overflow, stabilization_time=None):
@@ -184,14 +190,15 @@ class EyesWebElement(object):
         logger.debug("Setting overflow: %s" % overflow)
         if overflow is None:
             script = "var elem = arguments[0]; var origOverflow = elem.style.overflow; " \
-                     "elem.style.overflow = undefined; " \
-                     "return origOverflow;"
+                     "elem.style.overflow = undefined; "
         else:
             script = "var elem = arguments[0]; var origOverflow = elem.style.overflow; " \
-                     "elem.style.overflow = \"{0}\"; " \
-                     "return origOverflow;".format(overflow)
+                     "elem.style.overflow = \"{0}\"; ".format(overflow)
+        # The metrics are collected right after the change, so the snapshot stays valid.
+        script += self._JS_COLLECT_METRICS + "return [origOverflow, metrics];"
         # noinspection PyUnresolvedReferences
-        original_overflow = self._driver.execute_script(script, self.element)
+        original_overflow, metrics = self._driver.execute_script(script, self.element)
+        self._metrics = dict(zip(self._METRICS_KEYS, metrics))
         logger.debug("Original overflow: %s" % original_overflow)
         if stabilization_time is not None:
             time.sleep(stabilization_time / 1000)
@@ -207,7 +214,30 @@ class EyesWebElement(object):
         logger.debug('EyesWebElement.HideScrollbars()')
         return self.set_overflow('hidden')
 
+    def get_metrics(self):
+        # type: () -> tp.Dict[tp.Text, tp.Any]
+        """
+        Gets the element's scroll position and size, client size, border widths and overflow, all
+        fetched by a single script. The result is cached until the element is scrolled, its overflow
+        is changed or it's interacted with through this object (see reset_metrics).
+
+        :return: The element's metrics.
+        """
+        if self._metrics is None:
+            metrics = scripts.execute_script(self._driver, self._JS_GET_METRICS, self.element)
+            self._metrics = dict(zip(self._METRICS_KEYS, metrics))
+        return self._metrics
+
+    def reset_metrics(self):
+        # type: () -> None
+        """
+        Discards the element's cached metrics, so the next getter fetches them again.
+        """
+        self._metrics = None
+
     def get_computed_style(self, prop_style):
+        if prop_style in self._COMPUTED_STYLE_METRICS_KEYS:
+            return self.get_metrics()[prop_style]
         script = self._JS_GET_COMPUTED_STYLE_FORMATTED_STR % prop_style
         return self._driver.execute_script(script, self.element)
 
@@ -217,16 +247,16 @@ class EyesWebElement(object):
         return int(round(float(value.replace('px', '').strip())))
 
     def get_scroll_left(self):
-        return int(math.ceil(self._driver.execute_script(self._JS_GET_SCROLL_LEFT, self.element)))
+        return int(math.ceil(self.get_metrics()['scroll_left']))
 
     def get_scroll_top(self):
-        return math.ceil(self._driver.execute_script(self._JS_GET_SCROLL_TOP, self.element))
+        return int(math.ceil(self.get_metrics()['scroll_top']))
 
     def get_scroll_width(self):
-        return int(math.ceil(self._driver.execute_script(self._JS_GET_SCROLL_WIDTH, self.element)))
+        return int(math.ceil(self.get_metrics()['scroll_width']))
 
     def get_scroll_height(self):
-        return int(math.ceil(self._driver.execute_script(self._JS_GET_SCROLL_HEIGHT, self.element)))
+        return int(math.ceil(self.get_metrics()['scroll_height']))
 
     def get_border_left_width(self):
         return self.get_computed_style_int('border-left-width')
@@ -235,22 +265,23 @@ class EyesWebElement(object):
         return self.get_computed_style_int('border-right-width')
 
     def get_border_top_width(self):
-        return self.get_computed_style_int('border-right-width')
+        return self.get_computed_style_int('border-top-width')
 
     def get_border_bottom_width(self):
-        return self.get_computed_style_int('border-right-width')
+        return self.get_computed_style_int('border-bottom-width')
 
     def get_overflow(self):
-        return self._driver.execute_script(self._JS_GET_OVERFLOW, self.element)
+        return self.get_metrics()['overflow']
 
     def get_client_width(self):
-        return int(math.ceil(float(self._driver.execute_script(self._JS_GET_CLIENT_WIDTH, self.element))))
+        return int(math.ceil(float(self.get_metrics()['client_width'])))
 
     def get_client_height(self):
-        return int(math.ceil(float(self._driver.execute_script(self._JS_GET_CLIENT_HEIGHT, self.element))))
+        return int(math.ceil(float(self.get_metrics()['client_height'])))
 
     def scroll_to(self, location):
         # type: (Point) -> None
         """Scrolls to the specified location inside the element."""
+        self.reset_metrics()
         self._driver.execute_script(
             self._JS_SCROLL_TO_FORMATTED_STR.format(location.x, location.y), self.element)
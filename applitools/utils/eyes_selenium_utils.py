@@ -1,23 +1,29 @@
 from __future__ import absolute_import
 
+import json
+import os
 import time
 import typing as tp
-from contextlib import contextmanager
+from collections import OrderedDict
 
 from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.remote.webdriver import WebDriver
 
 from ..core import logger, EyesError
+from . import scripts
 
 if tp.TYPE_CHECKING:
-    from .custom_types import AnyWebDriver, ViewPort
+    from .custom_types import AnyWebDriver, AnyWebElement, ViewPort
 
 __all__ = ('get_current_frame_content_entire_size', 'get_device_pixel_ratio', 'get_viewport_size',
-           'get_window_size', 'set_window_size', 'set_browser_size', 'set_browser_size_by_viewport_size',
-           'set_viewport_size', 'hide_scrollbars', 'set_overflow')
+           'get_window_size', 'set_window_size', 'set_browser_size', 'set_viewport_size',
+           'hide_scrollbars', 'set_overflow', 'freeze_animations', 'unfreeze_animations',
+           'load_lazy_content', 'wait_for_page_ready', 'cancel_pending_script', 'track_dirty_bands',
+           'take_dirty_bands', 'get_elements_bounds', 'get_driver_profile', 'invalidate_driver_profile',
+           'get_user_agent', 'get_known_viewport_size')
 
 _NATIVE_APP = 'NATIVE_APP'
-_JS_GET_VIEWPORT_SIZE = """
+_JS_GET_VIEWPORT_SIZE = scripts.register('viewportSize', """
     var height = undefined;
     var width = undefined;
     if (window.innerHeight) {
@@ -37,15 +43,15 @@ _JS_GET_VIEWPORT_SIZE = """
     if (b.clientWidth) {
         width = b.clientWidth;}
     }
-    return [width, height];"""
+    return [width, height];""")
 
-_JS_GET_CURRENT_SCROLL_POSITION = """
+_JS_GET_CURRENT_SCROLL_POSITION = scripts.register('scrollPosition', """
     var doc = document.documentElement;
     var x = window.scrollX || ((window.pageXOffset || doc.scrollLeft) - (doc.clientLeft || 0));
     var y = window.scrollY || ((window.pageYOffset || doc.scrollTop) - (doc.clientTop || 0));
-    return [x, y]"""
+    return [x, y]""")
 
-_JS_GET_CONTENT_ENTIRE_SIZE = """
+_JS_GET_CONTENT_ENTIRE_SIZE = scripts.register('entireSize', """
     var scrollWidth = document.documentElement.scrollWidth;
     var bodyScrollWidth = document.body.scrollWidth;
     var totalWidth = Math.max(scrollWidth, bodyScrollWidth);
@@ -56,21 +62,316 @@ _JS_GET_CONTENT_ENTIRE_SIZE = """
     var maxDocElementHeight = Math.max(clientHeight, scrollHeight);
     var maxBodyHeight = Math.max(bodyClientHeight, bodyScrollHeight);
     var totalHeight = Math.max(maxDocElementHeight, maxBodyHeight);
-    return [totalWidth, totalHeight];";
-"""
-_JS_SET_OVERFLOW = """
-  return (function() {
-    var origOF = document.documentElement.style.overflow;
-    document.documentElement.style.overflow = '{overflow}';
-    return origOF;
-  }());
-"""
+    return [totalWidth, totalHeight];""")
+_JS_FREEZE_ANIMATIONS = scripts.register('freezeAnimations', """
+    var style = document.getElementById('applitools-freeze-animations');
+    if (!style) {
+        style = document.createElement('style');
+        style.id = 'applitools-freeze-animations';
+        style.textContent = '*, *::before, *::after {' +
+            'animation-play-state: paused !important; transition: none !important;' +
+            'scroll-behavior: auto !important; caret-color: transparent !important; }';
+        (document.head || document.documentElement).appendChild(style);
+    }
+    var paused = [];
+    var media = document.querySelectorAll('video, audio');
+    for (var i = 0; i < media.length; i++) {
+        if (!media[i].paused) {
+            media[i].pause();
+            paused.push(media[i]);
+        }
+    }
+    window.__applitoolsPausedMedia = paused;""")
+
+_JS_UNFREEZE_ANIMATIONS = scripts.register('unfreezeAnimations', """
+    var style = document.getElementById('applitools-freeze-animations');
+    if (style) {
+        style.parentNode.removeChild(style);
+    }
+    var paused = window.__applitoolsPausedMedia || [];
+    for (var i = 0; i < paused.length; i++) {
+        var playing = paused[i].play();
+        if (playing && playing.catch) {
+            playing.catch(function () {});
+        }
+    }
+    delete window.__applitoolsPausedMedia;""")
+
+# Cancels the async script which is still running in the page, if any. Our async scripts register a
+# cancel function when they start, since they might keep running after the call timed out on our side,
+# and they must not scroll the page or change its overflow while it's being captured.
+_JS_CANCEL_PENDING_SCRIPT = scripts.register('cancelPendingScript', """
+    if (window.__applitoolsCancelPending) {
+        window.__applitoolsCancelPending();
+    }""")
+
+# Makes lazy images and frames load eagerly, scrolls through the page one viewport at a time so
+# IntersectionObserver based loaders trigger, scrolls back and waits for the images to be decoded.
+_JS_LOAD_LAZY_CONTENT = scripts.minify(_JS_CANCEL_PENDING_SCRIPT + """
+    var callback = arguments[arguments.length - 1];
+    var stepDelay = arguments[0];
+    var deadline = new Date().getTime() + arguments[1];
+    var lazyElements = document.querySelectorAll('img[loading="lazy"], iframe[loading="lazy"]');
+    for (var i = 0; i < lazyElements.length; i++) {
+        lazyElements[i].setAttribute('loading', 'eager');
+    }
+    var doc = document.documentElement;
+    var originalX = window.pageXOffset || doc.scrollLeft;
+    var originalY = window.pageYOffset || doc.scrollTop;
+    var y = 0;
+    var done = false;
+    var timer;
+    function cancel() {
+        done = true;
+        clearTimeout(timer);
+        if (window.__applitoolsCancelPending === cancel) {
+            delete window.__applitoolsCancelPending;
+        }
+    }
+    window.__applitoolsCancelPending = cancel;
+    function report() {
+        if (!done) {
+            cancel();
+            callback(lazyElements.length);
+        }
+    }
+    function decodeImages() {
+        if (done) {
+            return;
+        }
+        window.scrollTo(originalX, originalY);
+        if (!window.Promise || !HTMLImageElement.prototype.decode) {
+            report();
+            return;
+        }
+        var decoding = [];
+        for (var i = 0; i < document.images.length; i++) {
+            if (document.images[i].src) {
+                decoding.push(document.images[i].decode().catch(function () {}));
+            }
+        }
+        Promise.all(decoding).then(report, report);
+        timer = setTimeout(report, Math.max(deadline - new Date().getTime(), 0));
+    }
+    function step() {
+        if (done) {
+            return;
+        }
+        var height = Math.max(doc.scrollHeight, document.body ? document.body.scrollHeight : 0);
+        window.scrollTo(originalX, y);
+        y += window.innerHeight || doc.clientHeight;
+        if (y >= height || new Date().getTime() >= deadline) {
+            timer = setTimeout(decodeImages, stepDelay);
+        } else {
+            timer = setTimeout(step, stepDelay);
+        }
+    }
+    step();""")
+_LAZY_CONTENT_STEP_DELAY = 50  # ms
+_LAZY_CONTENT_TIMEOUT = 10000  # ms
+
+# Records the vertical bands (in page coordinates) of elements changed by DOM mutations. Style changes
+# of the document element and the body (scroll bars hiding, CSS stitching) and the SDK's own elements
+# are ignored.
+# Images which finished loading and fonts which were loaded are recorded too, since they change the page
+# without DOM mutations.
+_JS_TRACK_DIRTY_BANDS = scripts.register('trackDirtyBands', """
+    var tracker = window.__applitoolsDirtyBands;
+    if (!tracker) {
+        tracker = window.__applitoolsDirtyBands = {bands: []};
+        var isOwnNode = function (node) {
+            return !!(node && node.id && node.id.indexOf('applitools') === 0);
+        };
+        var addBand = function (element) {
+            var scrollTop = window.pageYOffset || document.documentElement.scrollTop;
+            var rect = element && element.getBoundingClientRect();
+            // Hidden elements have no size, so the band of their closest visible ancestor is used.
+            while (element && !rect.height) {
+                element = element.parentElement;
+                rect = element && element.getBoundingClientRect();
+            }
+            if (element) {
+                tracker.bands.push([Math.floor(rect.top + scrollTop), Math.ceil(rect.bottom + scrollTop)]);
+            }
+        };
+        new MutationObserver(function (mutations) {
+            for (var i = 0; i < mutations.length; i++) {
+                var mutation = mutations[i];
+                if (mutation.type === 'attributes' && mutation.attributeName === 'style' &&
+                        (mutation.target === document.documentElement || mutation.target === document.body)) {
+                    continue;
+                }
+                if (mutation.type === 'childList' &&
+                        (isOwnNode(mutation.addedNodes[0]) || isOwnNode(mutation.removedNodes[0]))) {
+                    continue;
+                }
+                addBand(mutation.target.nodeType === 1 ? mutation.target : mutation.target.parentElement);
+            }
+        }).observe(document.documentElement, {attributes: true, childList: true, characterData: true,
+                                              subtree: true});
+        // Load events don't bubble, but they're captured. Scripts and style sheets are ignored, since
+        // their changes show up as mutations (or as loaded fonts).
+        document.addEventListener('load', function (event) {
+            if (/^(IMG|IFRAME|OBJECT|EMBED)$/.test(event.target.tagName)) {
+                addBand(event.target);
+            }
+        }, true);
+        if (document.fonts && document.fonts.addEventListener) {
+            document.fonts.addEventListener('loadingdone', function () {
+                tracker.bands.push([0, document.documentElement.scrollHeight]);
+            });
+        }
+    }
+    tracker.bands = [];""")
+
+# Returns the bands recorded since the tracking started or since they were last returned (or null if the
+# changes weren't tracked, e.g. after navigation, or if the page is still loading), and clears them. The
+# bands of running animations, videos and canvases, whose changes aren't DOM mutations, are added.
+_JS_TAKE_DIRTY_BANDS = scripts.register('takeDirtyBands', """
+    var tracker = window.__applitoolsDirtyBands;
+    if (!tracker || document.readyState !== 'complete') {
+        return null;
+    }
+    var bands = tracker.bands;
+    tracker.bands = [];
+    var scrollTop = window.pageYOffset || document.documentElement.scrollTop;
+    var elements = Array.prototype.slice.call(document.querySelectorAll('video, canvas'));
+    if (document.getAnimations) {
+        var animations = document.getAnimations();
+        for (var i = 0; i < animations.length; i++) {
+            var target = animations[i].effect && animations[i].effect.target;
+            if (animations[i].playState === 'running' && target && target.getBoundingClientRect) {
+                elements.push(target);
+            }
+        }
+    }
+    for (var j = 0; j < elements.length; j++) {
+        var rect = elements[j].getBoundingClientRect();
+        if (rect.height) {
+            bands.push([Math.floor(rect.top + scrollTop), Math.ceil(rect.bottom + scrollTop)]);
+        }
+    }
+    return bands;""")
+
+# Returns the location (in the current frame's page) and size of each of the given elements, the same
+# way WebDriver reports them, or null for elements which were removed from the document.
+_JS_GET_ELEMENTS_BOUNDS = scripts.register('elementsBounds', """
+    var elements = arguments[0];
+    var doc = document.documentElement;
+    var x = window.scrollX || ((window.pageXOffset || doc.scrollLeft) - (doc.clientLeft || 0));
+    var y = window.scrollY || ((window.pageYOffset || doc.scrollTop) - (doc.clientTop || 0));
+    var bounds = [];
+    for (var i = 0; i < elements.length; i++) {
+        if (elements[i].isConnected === false) {
+            bounds.push(null);
+            continue;
+        }
+        var rect = elements[i].getBoundingClientRect();
+        bounds.push([Math.round(rect.left + x), Math.round(rect.top + y), rect.width, rect.height]);
+    }
+    return bounds;""")
+
+# Sets the overflow of the document element (unless it's set already) and returns the previous one.
+_JS_SET_OVERFLOW = scripts.register('setOverflow', _JS_CANCEL_PENDING_SCRIPT + """
+    var style = document.documentElement.style;
+    var originalOverflow = style.overflow;
+    if (originalOverflow !== arguments[0]) {
+        style.overflow = arguments[0];
+    }
+    return originalOverflow;""")
+
+# Waits until the document is complete, its fonts are loaded and the images loading in the viewport
+# are decoded, then sets the overflow of the document element if one is given and it's not set already.
+# Reports whether the page got ready and the previous overflow. If the timeout passes first, the
+# overflow isn't set. A wait which is still pending (e.g., since the caller stopped waiting for it) is
+# cancelled by the next async script or overflow change, so it can't change the overflow later on.
+_JS_WAIT_FOR_PAGE_READY = scripts.minify(_JS_CANCEL_PENDING_SCRIPT + """
+    var callback = arguments[arguments.length - 1];
+    var overflow = arguments[0];
+    var done = false;
+    var timer;
+    function cancel() {
+        done = true;
+        clearTimeout(timer);
+        document.removeEventListener('readystatechange', onReadyStateChange);
+        if (window.__applitoolsCancelPending === cancel) {
+            delete window.__applitoolsCancelPending;
+        }
+    }
+    window.__applitoolsCancelPending = cancel;
+    function report(ready) {
+        if (done) {
+            return;
+        }
+        cancel();
+        var style = document.documentElement.style;
+        var originalOverflow = style.overflow;
+        if (ready && overflow && originalOverflow !== overflow) {
+            style.overflow = overflow;
+        }
+        callback([ready, originalOverflow]);
+    }
+    function ready() {
+        report(true);
+    }
+    function isInViewport(element) {
+        var rect = element.getBoundingClientRect();
+        return rect.bottom > 0 && rect.right > 0 && rect.top < window.innerHeight && rect.left < window.innerWidth;
+    }
+    function waitForImages() {
+        if (!window.Promise || !HTMLImageElement.prototype.decode) {
+            ready();
+            return;
+        }
+        var decoding = [];
+        for (var i = 0; i < document.images.length; i++) {
+            var image = document.images[i];
+            if (image.src && !image.complete && image.loading !== 'lazy' && isInViewport(image)) {
+                decoding.push(image.decode().catch(function () {}));
+            }
+        }
+        Promise.all(decoding).then(ready, ready);
+    }
+    function waitForFonts() {
+        if (document.fonts && document.fonts.ready) {
+            document.fonts.ready.then(waitForImages, waitForImages);
+        } else {
+            waitForImages();
+        }
+    }
+    function onReadyStateChange() {
+        if (document.readyState === 'complete') {
+            document.removeEventListener('readystatechange', onReadyStateChange);
+            waitForFonts();
+        }
+    }
+    timer = setTimeout(function () {
+        report(false);
+    }, arguments[1]);
+    if (document.readyState === 'complete') {
+        waitForFonts();
+    } else {
+        document.addEventListener('readystatechange', onReadyStateChange);
+    }""")
+_PAGE_READY_TIMEOUT = 3000  # ms
 
 _JS_TRANSFORM_KEYS = ("transform", "-webkit-transform")
 _OVERFLOW_HIDDEN = 'hidden'
 _MAX_DIFF = 3
-_SLEEP = 1  # sec
+_RESIZE_TIMEOUT = 1  # sec
+_POLL_INTERVAL = 0.05  # sec
 _RETRIES = 3
+# The path of a json file in which the window chrome sizes are kept between runs (optional).
+_WINDOW_CHROME_CACHE_PATH_ENV = 'APPLITOOLS_WINDOW_CHROME_CACHE'
+
+# The difference between the window size and the viewport size, by browser name, version and whether
+# it's headless. Once known, a viewport size is set with a single window resize.
+_window_chrome_sizes = None  # type: tp.Optional[tp.Dict[tp.Text, tp.List[int]]]
+
+# Facts about browsers (see get_driver_profile), by the session id of the driver controlling them,
+# for the most recently used sessions.
+_MAX_DRIVER_PROFILES = 50
+_driver_profiles = OrderedDict()  # type: OrderedDict
 
 
 def is_mobile_device(driver):
@@ -84,6 +385,17 @@ def is_mobile_device(driver):
     return driver.desired_capabilities.get('platformName') in ('Android', 'iOS')
 
 
+def is_headless_browser(driver):
+    # type: (AnyWebDriver) -> bool
+    """
+    Returns whether the browser is running headless (and so its window isn't limited by a screen).
+    """
+    driver = get_underlying_driver(driver)
+    if driver.capabilities.get('moz:headless'):
+        return True
+    return 'Headless' in (get_user_agent(driver) or '')
+
+
 def get_underlying_driver(driver):
     # type: (AnyWebDriver) -> WebDriver
     from ..selenium.webdriver import EyesWebDriver
@@ -92,13 +404,73 @@ def get_underlying_driver(driver):
     return driver
 
 
+def get_driver_profile(driver):
+    # type: (AnyWebDriver) -> tp.Dict[tp.Text, tp.Any]
+    """
+    Returns the facts collected so far about the browser controlled by the driver's session (e.g.,
+    its user agent and viewport size). Since a driver is usually reused by many Eyes sessions, each
+    with its own EyesWebDriver, the facts are kept by the session id rather than by the wrapper, so
+    they're read from the browser only once.
+
+    Facts which might change are invalidated by the SDK when it changes them (e.g., the viewport
+    size when resizing the window through the SDK or through an EyesWebDriver). Since the window
+    might also be resized through the underlying driver directly, the viewport size is only used
+    while the window has the size it had when the viewport size was known (see
+    get_known_viewport_size).
+
+    :param driver: The driver whose profile to return.
+    :return: The profile, which may be updated in place.
+    """
+    session_id = getattr(get_underlying_driver(driver), 'session_id', None)
+    if session_id is None:
+        # Nothing to key the profile by, so nothing is kept.
+        return {}
+    profile = _driver_profiles.pop(session_id, None)
+    if profile is None:
+        profile = {}
+        while len(_driver_profiles) >= _MAX_DRIVER_PROFILES:
+            _driver_profiles.popitem(last=False)
+    _driver_profiles[session_id] = profile
+    return profile
+
+
+def invalidate_driver_profile(driver, *keys):
+    # type: (AnyWebDriver, *tp.Text) -> None
+    """
+    Forgets facts about the browser controlled by the driver's session, so they're read again.
+
+    :param driver: The driver whose profile to update.
+    :param keys: The facts to forget.
+    """
+    profile = get_driver_profile(driver)
+    for key in keys:
+        profile.pop(key, None)
+
+
+def get_user_agent(driver):
+    # type: (AnyWebDriver) -> tp.Optional[tp.Text]
+    """
+    :return: The browser's user agent, or None if it can't be read (e.g., in native apps).
+    """
+    profile = get_driver_profile(driver)
+    if 'user_agent' not in profile:
+        try:
+            user_agent = get_underlying_driver(driver).execute_script('return navigator.userAgent;')
+        except WebDriverException:
+            logger.info("Failed to obtain user-agent string")
+            return None
+        logger.info("user agent: {}".format(user_agent))
+        profile['user_agent'] = user_agent
+    return profile['user_agent']
+
+
 def get_current_frame_content_entire_size(driver):
     # type: (AnyWebDriver) -> ViewPort
     """
     :return: The size of the entire content.
     """
     try:
-        width, height = driver.execute_script(_JS_GET_CONTENT_ENTIRE_SIZE)
+        width, height = scripts.execute_script(driver, _JS_GET_CONTENT_ENTIRE_SIZE)
     except WebDriverException:
         raise EyesError('Failed to extract entire size!')
     return dict(width=width, height=height)
@@ -106,7 +478,11 @@ def get_current_frame_content_entire_size(driver):
 
 def get_device_pixel_ratio(driver):
     # type: (AnyWebDriver) -> float
-    return driver.execute_script('return window.devicePixelRatio;')
+    """
+    :return: The browser's device pixel ratio. It isn't kept in the driver profile, since it changes
+        with the page's zoom level, which browsers keep per site.
+    """
+    return get_underlying_driver(driver).execute_script('return window.devicePixelRatio;')
 
 
 def get_viewport_size(driver):
@@ -119,13 +495,31 @@ def get_viewport_size(driver):
     """
     # noinspection PyBroadException
     try:
-        width, height = driver.execute_script(_JS_GET_VIEWPORT_SIZE)
+        width, height = scripts.execute_script(driver, _JS_GET_VIEWPORT_SIZE)
         return dict(width=width, height=height)
     except WebDriverException:
         logger.info('Failed to get viewport size. Only window size is available')
         return get_window_size(driver)
 
 
+def get_known_viewport_size(driver):
+    # type: (AnyWebDriver) -> tp.Optional[ViewPort]
+    """
+    Returns the viewport size kept in the driver profile, if the window wasn't resized since it was
+    set or read (which is checked by reading the window size once). The window size is kept along
+    with it, so a viewport size read right after this call is valid at that window size.
+
+    :return: The viewport size, or None if it isn't known.
+    """
+    profile = get_driver_profile(driver)
+    window_size = get_window_size(driver)
+    if profile.get('window_size') != window_size:
+        # The window was resized since, e.g., through the underlying driver.
+        profile.pop('viewport_size', None)
+        profile['window_size'] = window_size
+    return profile.get('viewport_size')
+
+
 def get_window_size(driver):
     # type: (AnyWebDriver) -> ViewPort
     return driver.get_window_size()
@@ -133,42 +527,120 @@ def get_window_size(driver):
 
 def set_window_size(driver, size):
     # type: (AnyWebDriver, ViewPort) -> None
+    invalidate_driver_profile(driver, 'viewport_size', 'window_size')
     driver.set_window_size(size['width'], size['height'])
 
 
+def _wait_for_size(get_size, required_size, previous_size):
+    # type: (tp.Callable[[], ViewPort], ViewPort, ViewPort) -> ViewPort
+    """
+    Reads a size in short intervals, until it's the required size or it settled on another size
+    (read twice in a row, and different than the size before the resize), or until the timeout passes.
+
+    :param get_size: Reads the size.
+    :param required_size: The size we expect.
+    :param previous_size: The size before the resize.
+    :return: The last size read.
+    """
+    deadline = time.time() + _RESIZE_TIMEOUT
+    size = get_size()
+    while size != required_size and time.time() < deadline:
+        time.sleep(_POLL_INTERVAL)
+        last_size, size = size, get_size()
+        if size == last_size and size != previous_size:
+            break
+    return size
+
+
+def _wait_for_viewport_size(driver, required_size, previous_size):
+    # type: (AnyWebDriver, ViewPort, ViewPort) -> ViewPort
+    return _wait_for_size(lambda: get_viewport_size(driver), required_size, previous_size)
+
+
+def _window_chrome_key(driver):
+    # type: (AnyWebDriver) -> tp.Text
+    capabilities = get_underlying_driver(driver).capabilities
+    return '{}|{}|{}'.format(capabilities.get('browserName'),
+                             capabilities.get('browserVersion', capabilities.get('version')),
+                             'headless' if is_headless_browser(driver) else 'headed')
+
+
+def _get_window_chrome_sizes():
+    # type: () -> tp.Dict[tp.Text, tp.List[int]]
+    global _window_chrome_sizes
+    if _window_chrome_sizes is None:
+        _window_chrome_sizes = {}
+        path = os.environ.get(_WINDOW_CHROME_CACHE_PATH_ENV)
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    _window_chrome_sizes.update(json.load(f))
+            except (IOError, OSError, ValueError) as e:
+                logger.info("Failed to read the window chrome sizes from {}: {}".format(path, e))
+    return _window_chrome_sizes
+
+
+def _save_window_chrome_size(key, width, height):
+    # type: (tp.Text, int, int) -> None
+    sizes = _get_window_chrome_sizes()
+    sizes[key] = [width, height]
+    path = os.environ.get(_WINDOW_CHROME_CACHE_PATH_ENV)
+    if path:
+        try:
+            with open(path, 'w') as f:
+                json.dump(sizes, f)
+        except (IOError, OSError) as e:
+            logger.info("Failed to save the window chrome sizes to {}: {}".format(path, e))
+
+
 def set_browser_size(driver, required_size):
     # type: (AnyWebDriver, ViewPort) -> bool
 
-    retries_left = _RETRIES
-
     # set browser size for mobile devices isn't working
     if is_mobile_device(driver):
         return True
 
-    while True:
+    # The size before each resize, so we don't mistake it for a size the window settled on.
+    current_size = get_window_size(driver)
+    for _ in range(_RETRIES):
+        if current_size == required_size:
+            break
         logger.info("Trying to set browser size to: " + str(required_size))
         set_window_size(driver, required_size)
-        time.sleep(_SLEEP)
-        current_size = get_window_size(driver)
-        logger.info("Current browser size: " + str(required_size))
-
-        if retries_left or current_size != required_size:
-            break
-        retries_left -= 1
+        current_size = _wait_for_size(lambda: get_window_size(driver), required_size, current_size)
+        logger.info("Current browser size: " + str(current_size))
 
     return current_size == required_size
 
 
-def set_browser_size_by_viewport_size(driver, actual_viewport_size, required_size):
-    # type: (AnyWebDriver, ViewPort, ViewPort) -> bool
+def _set_viewport_size_by_window_chrome(driver, required_size, actual_viewport_size):
+    # type: (AnyWebDriver, ViewPort, ViewPort) -> ViewPort
+    """
+    Sets the viewport size by resizing the window once, according to the cached (or measured)
+    window chrome size of the browser. The chrome size is cached if it turned out right.
+
+    :return: The viewport size reached.
+    """
+    key = _window_chrome_key(driver)
+    chrome_size = _get_window_chrome_sizes().get(key)
+    if chrome_size is not None:
+        set_browser_size(driver, dict(width=required_size['width'] + chrome_size[0],
+                                      height=required_size['height'] + chrome_size[1]))
+        reached_size = _wait_for_viewport_size(driver, required_size, actual_viewport_size)
+        if reached_size == required_size:
+            return reached_size
+        logger.info("The cached window chrome size of {} is wrong: {}".format(key, chrome_size))
+        actual_viewport_size = reached_size
 
     browser_size = get_window_size(driver)
-    logger.debug("Current browser size: {}".format(browser_size))
-    required_browser_size = dict(
-        width=browser_size['width'] + (required_size['width'] - actual_viewport_size['width']),
-        height=browser_size['height'] + (required_size['height'] - actual_viewport_size['height'])
-    )
-    return set_browser_size(driver, required_browser_size)
+    chrome_width = browser_size['width'] - actual_viewport_size['width']
+    chrome_height = browser_size['height'] - actual_viewport_size['height']
+    set_browser_size(driver, dict(width=required_size['width'] + chrome_width,
+                                  height=required_size['height'] + chrome_height))
+    reached_size = _wait_for_viewport_size(driver, required_size, actual_viewport_size)
+    if reached_size == required_size:
+        _save_window_chrome_size(key, chrome_width, chrome_height)
+    return reached_size
 
 
 def set_viewport_size(driver, required_size):
@@ -176,19 +648,30 @@ def set_viewport_size(driver, required_size):
 
     logger.info("set_viewport_size({})".format(str(required_size)))
 
-    actual_viewport_size = get_viewport_size(driver)
+    # A viewport size known to be set already saves reading it.
+    actual_viewport_size = get_known_viewport_size(driver)
+    if actual_viewport_size != required_size:
+        actual_viewport_size = get_viewport_size(driver)
     if actual_viewport_size == required_size:
         logger.info("Required size already set.")
-        return None
+    else:
+        _set_viewport_size(driver, required_size, actual_viewport_size)
+    profile = get_driver_profile(driver)
+    if 'window_size' not in profile:
+        # The window was resized.
+        profile['window_size'] = get_window_size(driver)
+    profile['viewport_size'] = dict(required_size)
+
 
+def _set_viewport_size(driver, required_size, actual_viewport_size):
+    # type: (AnyWebDriver, ViewPort, ViewPort) -> None
     try:
         # We move the window to (0,0) to have the best chance to be able to
         # set the viewport size as requested.
         driver.set_window_position(0, 0)
     except WebDriverException:
         logger.info('Warning: Failed to move the browser window to (0,0)')
-    set_browser_size_by_viewport_size(driver, actual_viewport_size, required_size)
-    actual_viewport_size = get_viewport_size(driver)
+    actual_viewport_size = _set_viewport_size_by_window_chrome(driver, required_size, actual_viewport_size)
     if actual_viewport_size == required_size:
         return None
 
@@ -197,8 +680,7 @@ def set_viewport_size(driver, required_size):
     # non-maximized, so the original browser size calculation is
     # wrong).
     logger.info("Trying workaround for maximization...")
-    set_browser_size_by_viewport_size(driver, actual_viewport_size, required_size)
-    actual_viewport_size = get_viewport_size(driver)
+    actual_viewport_size = _set_viewport_size_by_window_chrome(driver, required_size, actual_viewport_size)
     logger.debug("Current viewport size: {}".format(actual_viewport_size))
     if actual_viewport_size == required_size:
         return None
@@ -235,7 +717,7 @@ def set_viewport_size(driver, required_size):
             set_browser_size(driver, required_browser_size)
             last_required_browser_size = required_browser_size
 
-            actual_viewport_size = get_viewport_size(driver)
+            actual_viewport_size = _wait_for_viewport_size(driver, required_size, actual_viewport_size)
             logger.info("Current viewport size: {}".format(actual_viewport_size))
 
             if actual_viewport_size == required_size:
@@ -250,11 +732,132 @@ def hide_scrollbars(driver):
 
 
 def set_overflow(driver, overflow):
-    with timeout(0.1):
-        return driver.execute_script(_JS_SET_OVERFLOW.format(overflow=overflow))
+    # type: (AnyWebDriver, tp.Text) -> tp.Text
+    """
+    Sets the overflow of the current context's document element.
+
+    :return: The previous overflow.
+    """
+    return scripts.execute_script(driver, _JS_SET_OVERFLOW, overflow)
+
 
+def wait_for_page_ready(driver, overflow=None, timeout=_PAGE_READY_TIMEOUT):
+    # type: (AnyWebDriver, tp.Optional[tp.Text], int) -> tp.Tuple[bool, tp.Text]
+    """
+    Waits, in a single script, until the current context's document is complete, its fonts are
+    loaded and the images loading in its viewport are decoded. Then sets the document element's
+    overflow if needed.
+
+    :param overflow: The overflow to set once the page is ready, if it's not set already (optional).
+                     It isn't set if the timeout passes first.
+    :param timeout: Milliseconds after which the script stops waiting.
+    :return: Whether the page got ready before the timeout, and the previous overflow.
+    :raise WebDriverException: If the script can't be run (e.g., asynchronous scripts aren't supported).
+    """
+    ready, original_overflow = driver.execute_async_script(_JS_WAIT_FOR_PAGE_READY, overflow, timeout)
+    return ready, original_overflow
 
-@contextmanager
-def timeout(timeout):
-    time.sleep(timeout)
-    yield
+
+def freeze_animations(driver):
+    # type: (AnyWebDriver) -> None
+    """
+    Pauses CSS animations and playing media, and disables transitions, smooth scrolling and caret
+    blinking in the current context, so the page doesn't change while it's captured.
+    """
+    scripts.execute_script(driver, _JS_FREEZE_ANIMATIONS)
+
+
+def unfreeze_animations(driver):
+    # type: (AnyWebDriver) -> None
+    """
+    Undoes :func:`freeze_animations`.
+    """
+    scripts.execute_script(driver, _JS_UNFREEZE_ANIMATIONS)
+
+
+def load_lazy_content(driver, step_delay=_LAZY_CONTENT_STEP_DELAY, timeout=_LAZY_CONTENT_TIMEOUT):
+    # type: (AnyWebDriver, int, int) -> None
+    """
+    Makes the current context load its lazy content (images and frames which are loaded only when
+    scrolled into view) in a single script, so it doesn't have to be waited for while stitching.
+
+    :param step_delay: Milliseconds to wait after scrolling each viewport.
+    :param timeout: Milliseconds after which the script stops scrolling and stops waiting for images.
+    """
+    start = time.time()
+    try:
+        count = driver.execute_async_script(_JS_LOAD_LAZY_CONTENT, step_delay, timeout)
+    except WebDriverException as e:
+        logger.info("Failed to load lazy content: {}".format(e))
+        # The script might still be running (e.g., if the driver's script timeout is shorter than ours),
+        # and it would scroll the page while it's being captured.
+        cancel_pending_script(driver)
+        return
+    logger.debug("Loaded lazy content ({} lazy elements) in {} ms".format(count, int((time.time() - start) * 1000)))
+
+
+def cancel_pending_script(driver):
+    # type: (AnyWebDriver) -> None
+    """
+    Stops our async script which is still running in the current context's page, if any (e.g., since
+    its call timed out).
+    """
+    try:
+        scripts.execute_script(driver, _JS_CANCEL_PENDING_SCRIPT)
+    except WebDriverException as e:
+        logger.info("Failed to cancel the pending script: {}".format(e))
+
+
+def track_dirty_bands(driver):
+    # type: (AnyWebDriver) -> None
+    """
+    Starts (or restarts) recording which vertical bands of the current context's page change. Since
+    changes made while a page is captured must be recorded too, tracking starts before its first part
+    is captured.
+    """
+    try:
+        scripts.execute_script(driver, _JS_TRACK_DIRTY_BANDS)
+    except WebDriverException as e:
+        logger.info("Failed to track the page's changes: {}".format(e))
+
+
+def take_dirty_bands(driver):
+    # type: (AnyWebDriver) -> tp.Optional[tp.List[tp.Tuple[int, int]]]
+    """
+    Returns the vertical bands (top and bottom, in page coordinates) of the current context's page which
+    changed since :func:`track_dirty_bands` was called or since they were last taken, and clears them in
+    the same script, so no change is lost in between. Returns None if the changes weren't tracked or the
+    page is still loading.
+    """
+    try:
+        bands = scripts.execute_script(driver, _JS_TAKE_DIRTY_BANDS)
+    except WebDriverException as e:
+        logger.info("Failed to get the page's changes: {}".format(e))
+        return None
+    if bands is None:
+        return None
+    return [(top, bottom) for top, bottom in bands]
+
+
+def get_elements_bounds(driver, elements):
+    # type: (AnyWebDriver, tp.List[AnyWebElement]) -> tp.List[tp.Optional[tp.Tuple[tp.Dict, tp.Dict]]]
+    """
+    Gets the locations and sizes of elements of the current context in a single script. If the script
+    fails (e.g., since one of the elements is stale), each element is read separately.
+
+    :param elements: The elements.
+    :return: The location and size of each element, or None for elements which aren't available anymore.
+    """
+    raw_elements = [getattr(element, 'element', element) for element in elements]
+    try:
+        bounds = scripts.execute_script(driver, _JS_GET_ELEMENTS_BOUNDS, raw_elements)
+        return [None if b is None else ({'x': b[0], 'y': b[1]}, {'width': b[2], 'height': b[3]}) for b in bounds]
+    except WebDriverException as e:
+        logger.debug("Failed to get the elements' bounds in a single script: {}".format(e))
+    results = []  # type: tp.List[tp.Optional[tp.Tuple[tp.Dict, tp.Dict]]]
+    for element in raw_elements:
+        try:
+            results.append((element.location, element.size))
+        except WebDriverException:
+            results.append(None)
+    return results
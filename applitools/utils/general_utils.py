@@ -4,18 +4,9 @@ General purpose utilities.
 from __future__ import absolute_import
 
 import json
-import types
 import typing as tp
 from datetime import timedelta, tzinfo
 
-if tp.TYPE_CHECKING:
-    from selenium.webdriver.remote.webdriver import WebDriver
-    from selenium.webdriver.remote.webelement import WebElement
-    from selenium.webdriver.remote.switch_to import SwitchTo
-
-    from ..selenium.webdriver import EyesWebDriver, _EyesSwitchTo
-    from ..selenium.webelement import EyesWebElement
-
 
 class _UtcTz(tzinfo):
     """
@@ -69,50 +60,42 @@ def create_proxy_property(property_name, target_name, is_settable=False):
         return property(_proxy_get, _proxy_set)
 
 
-def create_forwarded_method(from_,  # type: tp.Union[EyesWebDriver, EyesWebElement, _EyesSwitchTo]
-                            to,  # type: tp.Union[WebDriver, WebElement, SwitchTo]
-                            func_name,  # type: str
-                            ):
-    # type: (...) -> tp.Callable
+class _ForwardedAttribute(object):
     """
-    Returns a method(!) to be set on 'from_', which activates 'func_name' on 'to'.
-
-    :param from_: Source.
-    :param to: Destination.
-    :param func_name: The name of function to activate.
-    :return: Relevant method.
+    A (non-data) descriptor which reads an attribute of the object wrapped by a proxy.
     """
 
-    # noinspection PyUnusedLocal
-    def forwarded_method(self_, *args, **kwargs):
-        # type: (EyesWebDriver, *tp.Any, **tp.Any) -> tp.Callable
-        return getattr(to, func_name)(*args, **kwargs)
+    def __init__(self, name, target_name):
+        # type: (str, str) -> None
+        self._name = name
+        self._target_name = target_name
 
-    return types.MethodType(forwarded_method, from_)
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        return getattr(getattr(instance, self._target_name), self._name)
 
 
-def create_proxy_interface(from_,  # type: tp.Union[EyesWebDriver, EyesWebElement, _EyesSwitchTo]
-                           to,  # type: tp.Union[WebDriver, WebElement, SwitchTo]
-                           ignore_list=None,  # type: tp.List[str]
-                           override_existing=False,  # type: bool
-                           ):
-    # type: (...) -> None
+def create_forwarding_getattr(target_name):
+    # type: (str) -> tp.Callable
     """
-    Copies the public interface of the destination object, excluding names in the ignore_list,
-    and creates an identical interface in 'src', which forwards calls to dst.
+    Returns a `__getattr__` implementation which forwards the public attributes missing from a proxy
+    class to the object it wraps. Nothing is copied or bound per instance: the first time an
+    attribute is forwarded, a descriptor forwarding it is set on the proxy class, so later lookups
+    don't go through `__getattr__` at all.
 
-    :param from_: Source.
-    :param to: Destination.
-    :param ignore_list: List of names to ignore while copying.
-    :param override_existing: If False, attributes already existing in 'src' will not be overridden.
+    :param target_name: The name of the proxy's attribute holding the wrapped object.
+    :return: The `__getattr__` function, to be set in the proxy's class body.
     """
-    if not ignore_list:
-        ignore_list = []
-    for attr_name in dir(to):
-        if not attr_name.startswith('_') and attr_name not in ignore_list:
-            if callable(getattr(to, attr_name)):
-                if override_existing or not hasattr(from_, attr_name):
-                    setattr(from_, attr_name, create_forwarded_method(from_, to, attr_name))
+
+    def __getattr__(self, name):
+        if name.startswith('_') or name == target_name:
+            raise AttributeError(name)
+        value = getattr(getattr(self, target_name), name)
+        setattr(type(self), name, _ForwardedAttribute(name, target_name))
+        return value
+
+    return __getattr__
 
 
 def cached_property(f):
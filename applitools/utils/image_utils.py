@@ -6,9 +6,14 @@ from __future__ import absolute_import
 import base64
 import io
 import math
+import multiprocessing
+import struct
+import threading
 import typing as tp
+import zlib
+from multiprocessing.pool import ThreadPool
 
-from PIL import Image
+from PIL import Image, ImageChops
 
 from ..core.errors import EyesError
 
@@ -16,7 +21,34 @@ if tp.TYPE_CHECKING:
     from ..core.geometry import Region
 
 __all__ = ('image_from_file', 'image_from_bytes', 'image_from_base64',
-           'scale_image', 'get_base64', 'get_bytes', 'get_image_part')
+           'scale_image', 'get_base64', 'get_bytes', 'get_image_part',
+           'get_row_hashes', 'find_sticky_rows', 'find_vertical_offset',
+           'PngFilter', 'PngEncoder', 'PngStreamEncoder', 'iter_png_bytes', 'encode_png_parallel')
+
+DEFAULT_SCALE_RESAMPLE = Image.BICUBIC
+_INTEGER_RATIO_TOLERANCE = 1e-6
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# PNG color type and bytes per pixel of the image modes which can be encoded directly.
+_PNG_MODES = {'L': (0, 1), 'RGB': (2, 3), 'RGBA': (6, 4)}
+_PNG_BAND_HEIGHT = 256  # rows
+_PNG_COMPRESS_LEVEL = 6
+# Images smaller than this are encoded by Pillow, as splitting them isn't worth the overhead.
+_PNG_PARALLEL_MIN_PIXELS = 2 * 1000 * 1000
+_PNG_STRIP_HEIGHT = 512  # rows
+
+# The thread pools encoding strips, by their number of threads, shared by all the encodings.
+_encoding_pools = {}  # type: tp.Dict[int, ThreadPool]
+_encoding_pools_lock = threading.Lock()
+
+
+class PngFilter(object):
+    """
+    The filter types which can be applied on the image rows before they are compressed.
+    """
+    NONE = 0
+    SUB = 1
+    UP = 2
 
 
 def image_from_file(f):
@@ -48,16 +80,32 @@ def image_from_base64(base64_str):
     return Image.open(io.BytesIO(base64.b64decode(base64_str)))
 
 
-def scale_image(image, scale_ratio):
-    # type: (Image.Image, float) -> Image.Image
+def scale_image(image, scale_ratio, resample=DEFAULT_SCALE_RESAMPLE):
+    # type: (Image.Image, float, int) -> Image.Image
+    """
+    Scales the image by the given ratio.
+
+    :param scale_ratio: The ratio by which to scale the image (e.g., 0.5 for a device pixel ratio of 2).
+    :param resample: The resampling filter to use (e.g., Image.BICUBIC), unless the image is scaled
+                     down by an integer factor.
+    :return: The scaled image.
+    """
     if scale_ratio == 1:
         return image
 
+    if image.mode not in ('L', 'RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    factor = 1.0 / scale_ratio
+    int_factor = int(round(factor))
+    if int_factor > 1 and abs(factor - int_factor) < _INTEGER_RATIO_TOLERANCE and hasattr(image, 'reduce'):
+        # Averaging each block of factor x factor pixels is many times faster than resampling, and
+        # looks the same for integer ratios. (Image.reduce is only available since Pillow 7.)
+        return image.reduce(int_factor)
+
     image_ratio = float(image.height) / float(image.width)
     scale_width = int(math.ceil(image.width * scale_ratio))
     scale_height = int(math.ceil(scale_width * image_ratio))
-    image = image.convert('RGBA')
-    scaled_image = image.resize((scale_width, scale_height), resample=Image.BICUBIC)
+    scaled_image = image.resize((scale_width, scale_height), resample=resample)
     return scaled_image
 
 
@@ -65,32 +113,26 @@ def get_device_pixel_ratio(driver):
     return driver.execute_script('return window.devicePixelRatio;')
 
 
-def get_base64(image):
-    # type: (Image.Image) -> str
+def get_base64(image, compress_level=_PNG_COMPRESS_LEVEL):
+    # type: (Image.Image, int) -> str
     """
     Gets the base64 representation of the PNG bytes.
 
+    :param compress_level: The zlib compression level (0-9).
     :return: The base64 representation of the PNG bytes.
     """
-    image_bytes_stream = io.BytesIO()
-    image.save(image_bytes_stream, format='PNG')
-    image64 = base64.b64encode(image_bytes_stream.getvalue()).decode('utf-8')
-    image_bytes_stream.close()
-    return image64
+    return base64.b64encode(get_bytes(image, compress_level)).decode('utf-8')
 
 
-def get_bytes(image):
-    # type: (Image.Image) -> bytes
+def get_bytes(image, compress_level=_PNG_COMPRESS_LEVEL):
+    # type: (Image.Image, int) -> bytes
     """
-    Gets the image bytes.
+    Gets the image bytes. Large images are encoded in parallel strips.
 
+    :param compress_level: The zlib compression level (0-9).
     :return: The image bytes.
     """
-    image_bytes_stream = io.BytesIO()
-    image.save(image_bytes_stream, format='PNG')
-    image_bytes = image_bytes_stream.getvalue()
-    image_bytes_stream.close()
-    return image_bytes
+    return PngEncoder(compress_level, reduce_palette=False).encode(image)
 
 
 def get_image_part(image, region):
@@ -103,3 +145,334 @@ def get_image_part(image, region):
     if region.is_empty():
         raise EyesError('region is empty!')
     return image.crop(box=(region.left, region.top, region.right, region.bottom))
+
+
+def get_row_hashes(image, width=None):
+    # type: (Image.Image, tp.Optional[int]) -> tp.List[int]
+    """
+    Hashes each of the rows of the image, so rows can be compared between images quickly.
+
+    :param width: If given, only the leftmost `width` pixels of each row are hashed.
+    :return: The hashes of the rows, from top to bottom.
+    """
+    if width is not None and width < image.width:
+        image = image.crop((0, 0, width, image.height))
+    data = image.tobytes()
+    if not data:
+        return []
+    stride = len(data) // image.height
+    return [hash(data[i:i + stride]) for i in range(0, len(data), stride)]
+
+
+def find_sticky_rows(previous_rows, current_rows, max_rows):
+    # type: (tp.List[int], tp.List[int], int) -> tp.Tuple[int, int]
+    """
+    Finds the rows at the top and bottom of two captures of a scrolled viewport which didn't move with
+    the content (e.g., fixed position headers and footers).
+
+    :param previous_rows: The row hashes of the capture before scrolling.
+    :param current_rows: The row hashes of the capture after scrolling.
+    :param max_rows: The maximum number of rows to consider as sticky, at either end.
+    :return: The number of sticky rows at the top and at the bottom.
+    """
+    max_rows = min(max_rows, len(previous_rows), len(current_rows))
+    top = 0
+    while top < max_rows and previous_rows[top] == current_rows[top]:
+        top += 1
+    bottom = 0
+    while bottom < max_rows and previous_rows[-bottom - 1] == current_rows[-bottom - 1]:
+        bottom += 1
+    return top, bottom
+
+
+def find_vertical_offset(previous_rows, current_rows, expected_offset, max_drift, top=0, bottom=0):
+    # type: (tp.List[int], tp.List[int], int, int, int, int) -> int
+    """
+    Finds by how many rows the content was scrolled between two captures of the viewport, by matching
+    the rows both of them show.
+
+    :param previous_rows: The row hashes of the capture before scrolling.
+    :param current_rows: The row hashes of the capture after scrolling.
+    :param expected_offset: The offset according to the reported scroll positions.
+    :param max_drift: The maximum distance of the actual offset from the expected one.
+    :param top: The number of sticky rows at the top, which are ignored.
+    :param bottom: The number of sticky rows at the bottom, which are ignored.
+    :return: The offset whose overlapping rows match exactly, or which matches most of them. The expected
+             offset if there's no overlap to compare or no offset matches well enough.
+    """
+    height = min(len(previous_rows), len(current_rows))
+    candidates = range(max(expected_offset - max_drift, 1), min(expected_offset + max_drift, height) + 1)
+    best_offset, best_matches = expected_offset, 0.5
+    for offset in sorted(candidates, key=lambda o: abs(o - expected_offset)):
+        overlap = range(top, height - bottom - offset)
+        if not overlap:
+            continue
+        matches = sum(1 for row in overlap if current_rows[row] == previous_rows[row + offset])
+        if matches == len(overlap):
+            return offset
+        if float(matches) / len(overlap) > best_matches:
+            best_offset, best_matches = offset, float(matches) / len(overlap)
+    return best_offset
+
+
+def _png_chunk(chunk_type, data):
+    # type: (bytes, bytes) -> bytes
+    chunk = chunk_type + data
+    return struct.pack('>I', len(data)) + chunk + struct.pack('>I', zlib.crc32(chunk) & 0xffffffff)
+
+
+def _png_header(size, mode):
+    # type: (tp.Tuple[int, int], tp.Text) -> bytes
+    width, height = size
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, _PNG_MODES[mode][0], 0, 0, 0)
+    return _PNG_SIGNATURE + _png_chunk(b'IHDR', ihdr)
+
+
+def _filter_band(band, row_above, filter_type=PngFilter.UP):
+    # type: (Image.Image, tp.Optional[Image.Image], int) -> bytes
+    """
+    Applies a PNG filter on all the rows of the band.
+
+    :param band: The rows to filter.
+    :param row_above: The row preceding the band in the image, or None if the band is at the top.
+    :param filter_type: The PngFilter to apply.
+    :return: The filtered scanlines, each one prefixed by its filter type byte.
+    """
+    if filter_type == PngFilter.NONE:
+        raw = band.tobytes()
+    else:
+        # Each byte minus the matching byte of the pixel to the left (Sub) or above (Up), modulo 256.
+        # Computed for the whole band at once by subtracting a shifted copy of the band.
+        shifted = Image.new(band.mode, band.size)
+        if filter_type == PngFilter.SUB:
+            if band.width > 1:
+                shifted.paste(band.crop((0, 0, band.width - 1, band.height)), (1, 0))
+        else:
+            if row_above is not None:
+                shifted.paste(row_above, (0, 0))
+            if band.height > 1:
+                shifted.paste(band.crop((0, 0, band.width, band.height - 1)), (0, 1))
+        raw = ImageChops.subtract_modulo(band, shifted).tobytes()
+    filter_byte = struct.pack('B', filter_type)
+    stride = band.width * _PNG_MODES[band.mode][1]
+    return b''.join(filter_byte + raw[i:i + stride] for i in range(0, len(raw), stride))
+
+
+def _save_png(image, compress_level):
+    # type: (Image.Image, int) -> bytes
+    image_bytes_stream = io.BytesIO()
+    image.save(image_bytes_stream, format='PNG', compress_level=compress_level)
+    image_bytes = image_bytes_stream.getvalue()
+    image_bytes_stream.close()
+    return image_bytes
+
+
+def _reduce_to_palette(image):
+    # type: (Image.Image) -> tp.Optional[Image.Image]
+    """
+    :return: A palette image with exactly the same pixels as the given image, or None if the image
+        can't be converted losslessly (e.g., it has more than 256 colors).
+    """
+    if image.mode not in ('RGB', 'RGBA') or image.getcolors(256) is None:
+        return None
+    if image.mode == 'RGBA':
+        if image.getextrema()[3] != (255, 255):
+            return None
+        image = image.convert('RGB')
+    palette_image = image.quantize(colors=256)
+    if palette_image.convert('RGB').tobytes() != image.tobytes():
+        return None
+    return palette_image
+
+
+class PngEncoder(object):
+    """
+    Encodes screenshots as PNG.
+    """
+
+    def __init__(self, compress_level=_PNG_COMPRESS_LEVEL, filter_type=None, reduce_palette=False):
+        # type: (int, tp.Optional[int], bool) -> None
+        """
+        Ctor.
+
+        :param compress_level: The zlib compression level (0-9).
+        :param filter_type: The PngFilter applied on all the rows. If None, Pillow's adaptive filtering
+                            is used for small images, and the Up filter for large images (which are
+                            encoded in parallel strips).
+        :param reduce_palette: Whether images with 256 colors or less should be encoded with a palette.
+                               The encoded pixels are identical either way, but counting the colors
+                               costs time on every image, so it's off by default.
+        """
+        self.compress_level = compress_level
+        self.filter_type = filter_type
+        self.reduce_palette = reduce_palette
+
+    @property
+    def settings(self):
+        # type: () -> tp.Tuple[int, tp.Optional[int], bool]
+        """
+        The settings which determine the encoded bytes (encoders with the same settings produce
+        the same bytes).
+        """
+        return self.compress_level, self.filter_type, self.reduce_palette
+
+    def encode(self, image):
+        # type: (Image.Image) -> bytes
+        """
+        :return: The PNG bytes of the image.
+        """
+        if self.reduce_palette:
+            palette_image = _reduce_to_palette(image)
+            if palette_image is not None:
+                return _save_png(palette_image, self.compress_level)
+        if self.filter_type is None:
+            if image.width * image.height < _PNG_PARALLEL_MIN_PIXELS or multiprocessing.cpu_count() < 2:
+                return _save_png(image, self.compress_level)
+            return encode_png_parallel(image, self.compress_level)
+        return encode_png_parallel(image, self.compress_level, self.filter_type,
+                                   workers=None if multiprocessing.cpu_count() > 1 else 1)
+
+
+class PngStreamEncoder(object):
+    """
+    Encodes an image as PNG incrementally, one horizontal band at a time (top to bottom), so the
+    encoded data is available before the entire image is.
+    """
+
+    def __init__(self, size, mode='RGBA', compress_level=_PNG_COMPRESS_LEVEL, filter_type=PngFilter.UP):
+        # type: (tp.Tuple[int, int], tp.Text, int, int) -> None
+        """
+        Ctor.
+
+        :param size: The (width, height) of the entire image.
+        :param mode: The mode of the image bands which will be added ('L', 'RGB' or 'RGBA').
+        :param compress_level: The zlib compression level (0-9).
+        :param filter_type: The PngFilter applied on all the rows.
+        """
+        if mode not in _PNG_MODES:
+            raise EyesError('Unsupported image mode for PNG encoding: {}'.format(mode))
+        self.width, self.height = size
+        self.mode = mode
+        self.filter_type = filter_type
+        self._compressor = zlib.compressobj(compress_level)
+        self._rows_added = 0
+        self._last_row = None  # type: tp.Optional[Image.Image]
+
+    def header(self):
+        # type: () -> bytes
+        """
+        :return: The PNG signature and header chunk.
+        """
+        return _png_header((self.width, self.height), self.mode)
+
+    def add_rows(self, band):
+        # type: (Image.Image) -> bytes
+        """
+        Filters and compresses the next rows of the image.
+
+        :param band: The band of rows directly below the rows previously added.
+        :return: The encoded data which is ready (might be empty, as the compressor buffers data).
+        """
+        if band.mode != self.mode or band.width != self.width:
+            raise EyesError('Band does not match the encoded image! ({} {})'.format(band.mode, band.size))
+        if self._rows_added + band.height > self.height:
+            raise EyesError('Band exceeds the image height!')
+        data = self._compressor.compress(_filter_band(band, self._last_row, self.filter_type))
+        self._last_row = band.crop((0, band.height - 1, band.width, band.height))
+        self._rows_added += band.height
+        return _png_chunk(b'IDAT', data) if data else b''
+
+    def finish(self):
+        # type: () -> bytes
+        """
+        :return: The remaining encoded data and the PNG end chunk.
+        """
+        if self._rows_added != self.height:
+            raise EyesError('Only {} of {} rows were added!'.format(self._rows_added, self.height))
+        return _png_chunk(b'IDAT', self._compressor.flush()) + _png_chunk(b'IEND', b'')
+
+
+def iter_png_bytes(image, band_height=_PNG_BAND_HEIGHT, compress_level=_PNG_COMPRESS_LEVEL,
+                   filter_type=PngFilter.UP, box=None):
+    # type: (Image.Image, int, int, int, tp.Optional[tp.Tuple[int, int, int, int]]) -> tp.Iterator[bytes]
+    """
+    Encodes the image as PNG band by band, yielding the data as soon as it is encoded.
+
+    :param image: The image to encode.
+    :param band_height: The number of rows encoded at a time.
+    :param compress_level: The zlib compression level (0-9).
+    :param filter_type: The PngFilter applied on all the rows.
+    :param box: If given, only the (left, top, right, bottom) box of the image is encoded. The bands
+                are read straight from the image, without copying the box first.
+    :return: An iterator over the PNG bytes.
+    """
+    left, top, right, bottom = box if box is not None else (0, 0, image.width, image.height)
+    mode = image.mode if image.mode in _PNG_MODES else 'RGBA'
+    encoder = PngStreamEncoder((right - left, bottom - top), mode, compress_level, filter_type)
+    yield encoder.header()
+    for band_top in range(top, bottom, band_height):
+        band = image.crop((left, band_top, right, min(band_top + band_height, bottom)))
+        if band.mode != mode:
+            band = band.convert(mode)
+        data = encoder.add_rows(band)
+        if data:
+            yield data
+    yield encoder.finish()
+
+
+def _deflate_strip(args):
+    # type: (tp.Tuple[Image.Image, int, int, int, int]) -> tp.Tuple[bytes, bytes]
+    image, top, bottom, compress_level, filter_type = args
+    row_above = image.crop((0, top - 1, image.width, top)) if top > 0 else None
+    raw = _filter_band(image.crop((0, top, image.width, bottom)), row_above, filter_type)
+    # Raw deflate, so the strips can be concatenated into a single zlib stream. Flushing to a byte
+    # boundary (instead of finishing) keeps the stream open for the next strip.
+    compressor = zlib.compressobj(compress_level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    flush_mode = zlib.Z_FINISH if bottom == image.height else zlib.Z_SYNC_FLUSH
+    return compressor.compress(raw) + compressor.flush(flush_mode), raw
+
+
+def encode_png_parallel(image, compress_level=_PNG_COMPRESS_LEVEL, filter_type=PngFilter.UP,
+                        strip_height=_PNG_STRIP_HEIGHT, workers=None):
+    # type: (Image.Image, int, int, int, tp.Optional[int]) -> bytes
+    """
+    Encodes the image as PNG, compressing horizontal strips of it concurrently.
+
+    :param image: The image to encode.
+    :param compress_level: The zlib compression level (0-9).
+    :param filter_type: The PngFilter applied on all the rows.
+    :param strip_height: The number of rows in each independently compressed strip.
+    :param workers: The number of threads to use (defaults to the number of CPUs).
+    :return: The PNG bytes.
+    """
+    if image.mode not in _PNG_MODES:
+        image = image.convert('RGBA')
+    # Images opened from bytes are decoded lazily, and the strips mustn't decode them concurrently.
+    image.load()
+    chunks = [_png_header(image.size, image.mode)]
+    if image.height == 0:
+        chunks.append(_png_chunk(b'IDAT', zlib.compress(b'', compress_level)))
+        chunks.append(_png_chunk(b'IEND', b''))
+        return b''.join(chunks)
+    strips = [(image, top, min(top + strip_height, image.height), compress_level, filter_type)
+              for top in range(0, image.height, strip_height)]
+    # The header of the zlib stream (which includes the compression level) is the same one zlib writes.
+    zlib_header = zlib.compress(b'', compress_level)[:2]
+    checksum = zlib.adler32(b'')
+    for data, raw in _get_encoding_pool(workers or multiprocessing.cpu_count()).imap(_deflate_strip, strips):
+        checksum = zlib.adler32(raw, checksum)
+        chunks.append(_png_chunk(b'IDAT', zlib_header + data))
+        zlib_header = b''
+    chunks.append(_png_chunk(b'IDAT', struct.pack('>I', checksum & 0xffffffff)))
+    chunks.append(_png_chunk(b'IEND', b''))
+    return b''.join(chunks)
+
+
+def _get_encoding_pool(workers):
+    # type: (int) -> ThreadPool
+    # zlib releases the GIL while compressing, so threads are enough for the strips to run in parallel.
+    with _encoding_pools_lock:
+        pool = _encoding_pools.get(workers)
+        if pool is None:
+            pool = _encoding_pools[workers] = ThreadPool(workers)
+        return pool
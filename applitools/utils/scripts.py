@@ -0,0 +1,78 @@
+"""
+A registry of the scripts we run in the browser.
+
+Registered scripts are minified once, at import time. The first time a registered script runs in a
+page, all the registered scripts are installed there as functions of a helper object, and later calls
+only send a short script which invokes them by name. When the helper is missing (e.g., after
+navigating to another page, or in a frame it wasn't installed in yet), it's installed again.
+"""
+from __future__ import absolute_import
+
+import typing as tp
+
+if tp.TYPE_CHECKING:
+    from .custom_types import AnyWebDriver
+
+__all__ = ('minify', 'register', 'execute_script')
+
+# Returned by the call script when the helper wasn't installed in the current page.
+_MISSING = 'applitools:missing-script'
+_JS_CALL_FORMATTED_STR = ("var s = window.__applitoolsScripts;"
+                          "return s && s['{name}'] ? s['{name}'].apply(null, arguments) : '" + _MISSING + "';")
+_JS_INSTALL_FORMATTED_STR = "s['{name}'] = function () {{\n{script}\n}};"
+_JS_INSTALL_ALL_AND_CALL_FORMATTED_STR = ("var s = window.__applitoolsScripts = window.__applitoolsScripts || {{}};"
+                                          "{install}"
+                                          "return s['{name}'].apply(null, arguments);")
+
+# The registered scripts by their names, and the other way around.
+_names_by_script = {}  # type: tp.Dict[tp.Text, tp.Text]
+_scripts_by_name = {}  # type: tp.Dict[tp.Text, tp.Text]
+
+
+def minify(script):
+    # type: (tp.Text) -> tp.Text
+    """
+    Removes indentation, empty lines and whole-line comments from a script. Line breaks are kept,
+    so scripts relying on automatic semicolon insertion aren't broken.
+
+    :param script: The script to minify.
+    :return: The minified script.
+    """
+    lines = (line.strip() for line in script.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+
+def register(name, script):
+    # type: (tp.Text, tp.Text) -> tp.Text
+    """
+    Registers a (synchronous) script, so it's invoked by name once it's installed in the page.
+
+    :param name: A short name for the script.
+    :param script: The script's text.
+    :return: The minified script, which should be passed to execute_script.
+    """
+    script = minify(script)
+    if _scripts_by_name.setdefault(name, script) != script or _names_by_script.setdefault(script, name) != name:
+        raise ValueError("Script '{}' conflicts with an already registered script".format(name))
+    return script
+
+
+def execute_script(driver, script, *args):
+    # type: (AnyWebDriver, tp.Text, *tp.Any) -> tp.Any
+    """
+    Executes a script, invoking it by name if it's registered.
+
+    :param driver: The driver to execute the script with.
+    :param script: The script to execute.
+    :param args: The script's arguments.
+    :return: The script's result.
+    """
+    name = _names_by_script.get(script)
+    if name is None:
+        return driver.execute_script(script, *args)
+    result = driver.execute_script(_JS_CALL_FORMATTED_STR.format(name=name), *args)
+    if result == _MISSING:
+        install = ''.join(_JS_INSTALL_FORMATTED_STR.format(name=n, script=s) for n, s in _scripts_by_name.items())
+        result = driver.execute_script(_JS_INSTALL_ALL_AND_CALL_FORMATTED_STR.format(install=install, name=name),
+                                       *args)
+    return result
@@ -201,7 +201,9 @@ def pytest_runtest_makereport(item, call):
 
 def pytest_runtest_setup(item):
     """Skip tests that not fit for selected platform"""
-    platform_marker = item.get_marker("platform")
+    # get_marker was replaced by get_closest_marker in pytest 4.
+    get_marker = getattr(item, 'get_closest_marker', None) or item.get_marker
+    platform_marker = get_marker("platform")
     platform_cmd = item.config.getoption("platform")
     if platform_marker and platform_cmd:
         platforms = platform_marker.args
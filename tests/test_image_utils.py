@@ -0,0 +1,105 @@
+import io
+import os
+import struct
+import zlib
+
+import pytest
+from PIL import Image
+
+from applitools.core import EyesError
+from applitools.utils import image_utils
+from applitools.utils.image_utils import PngFilter, PngStreamEncoder
+
+
+def _random_image(mode, width=61, height=47):
+    image = Image.frombytes(mode, (width, height), os.urandom(width * height * len(mode)))
+    # Some repeated rows, so the filters have something to work with.
+    image.paste(image.crop((0, 0, width, 10)), (0, 20))
+    return image
+
+
+def _decode(png_bytes):
+    image = Image.open(io.BytesIO(png_bytes))
+    image.load()
+    return image
+
+
+@pytest.mark.parametrize('mode', ['L', 'RGB', 'RGBA'])
+@pytest.mark.parametrize('filter_type', [PngFilter.NONE, PngFilter.SUB, PngFilter.UP])
+def test_iter_png_bytes_round_trip(mode, filter_type):
+    image = _random_image(mode)
+    decoded = _decode(b''.join(image_utils.iter_png_bytes(image, band_height=7, filter_type=filter_type)))
+    assert decoded.mode == mode
+    assert decoded.size == image.size
+    assert decoded.tobytes() == image.tobytes()
+
+
+@pytest.mark.parametrize('mode', ['L', 'RGB', 'RGBA'])
+def test_iter_png_bytes_box(mode):
+    image = _random_image(mode)
+    box = (3, 5, 40, 33)
+    decoded = _decode(b''.join(image_utils.iter_png_bytes(image, band_height=10, box=box)))
+    assert decoded.size == (37, 28)
+    assert decoded.tobytes() == image.crop(box).tobytes()
+
+
+def test_iter_png_bytes_converts_other_modes():
+    image = _random_image('RGB').convert('P')
+    decoded = _decode(b''.join(image_utils.iter_png_bytes(image)))
+    assert decoded.mode == 'RGBA'
+    assert decoded.tobytes() == image.convert('RGBA').tobytes()
+
+
+def test_png_stream_encoder_rejects_mismatching_bands():
+    encoder = PngStreamEncoder((10, 4), 'RGB')
+    with pytest.raises(EyesError):
+        encoder.add_rows(Image.new('RGB', (9, 2)))
+    with pytest.raises(EyesError):
+        encoder.add_rows(Image.new('L', (10, 2)))
+    with pytest.raises(EyesError):
+        encoder.add_rows(Image.new('RGB', (10, 5)))
+    encoder.add_rows(Image.new('RGB', (10, 2)))
+    with pytest.raises(EyesError):
+        encoder.finish()
+
+
+@pytest.mark.parametrize('strip_height', [1, 7, 16, 100])
+@pytest.mark.parametrize('workers', [1, 2, 4])
+def test_encode_png_parallel_round_trip(strip_height, workers):
+    image = _random_image('RGB')
+    decoded = _decode(image_utils.encode_png_parallel(image, strip_height=strip_height, workers=workers))
+    assert decoded.tobytes() == image.tobytes()
+
+
+@pytest.mark.parametrize('compress_level', [0, 9])
+@pytest.mark.parametrize('mode', ['L', 'RGBA'])
+def test_encode_png_parallel_compress_levels(compress_level, mode):
+    image = _random_image(mode)
+    png_bytes = image_utils.encode_png_parallel(image, compress_level, strip_height=10, workers=3)
+    assert _decode(png_bytes).tobytes() == image.tobytes()
+
+
+def _iter_chunks(png_bytes):
+    position = 8
+    while position < len(png_bytes):
+        length = struct.unpack('>I', png_bytes[position:position + 4])[0]
+        yield png_bytes[position + 4:position + 8], png_bytes[position + 8:position + 8 + length]
+        position += 12 + length
+
+
+def test_encode_png_parallel_empty_image():
+    png_bytes = image_utils.encode_png_parallel(Image.new('RGB', (10, 0)), workers=2)
+    chunks = list(_iter_chunks(png_bytes))
+    assert [name for name, _ in chunks] == [b'IHDR', b'IDAT', b'IEND']
+    assert zlib.decompress(chunks[1][1]) == b''
+
+
+def test_encode_png_parallel_lazily_decoded_image():
+    image = _random_image('RGB', 300, 400)
+    buf = io.BytesIO()
+    image.save(buf, 'PNG')
+    for _ in range(5):
+        # Decoded only when its pixels are first read, which mustn't happen in several threads at once.
+        lazy_image = image_utils.image_from_bytes(buf.getvalue())
+        png_bytes = image_utils.encode_png_parallel(lazy_image, strip_height=16, workers=4)
+        assert _decode(png_bytes).tobytes() == image.tobytes()
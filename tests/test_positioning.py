@@ -0,0 +1,38 @@
+import json
+import subprocess
+
+import pytest
+
+from applitools.core.geometry import Point
+from applitools.selenium.positioning import CSSTranslatePositionProvider
+
+try:
+    from shutil import which
+except ImportError:  # Python 2
+    from distutils.spawn import find_executable as which
+
+# A minimal DOM, in which animation frames pass a timestamp to their callbacks, like browsers do.
+_JS_STUB_DOM = """
+var document = {documentElement: {style: {}}};
+var window = {requestAnimationFrame: function (callback) { setTimeout(function () { callback(123.45); }, 0); }};
+"""
+
+
+class _NodeDriver(object):
+    """
+    Runs async scripts in node, with a stubbed DOM.
+    """
+
+    def execute_async_script(self, script, *args):
+        source = _JS_STUB_DOM + "(function () {%s}).apply(null, %s.concat([function (result) {" \
+                                "console.log(JSON.stringify(result)); }]));" % (script, json.dumps(list(args)))
+        return json.loads(subprocess.check_output(['node', '-e', source]).decode('utf-8'))
+
+
+@pytest.mark.skipif(which('node') is None, reason="Requires node")
+def test_css_translate_set_position_and_report():
+    provider = CSSTranslatePositionProvider(_NodeDriver())
+    position = provider.set_position_and_report(Point(10, 250))
+    assert (position.x, position.y) == (10, 250)
+    position = provider.get_current_position()
+    assert (position.x, position.y) == (10, 250)
@@ -42,6 +42,17 @@ def test_sample_script(eyes, driver):
     eyes.close()
 
 
+@pytest.mark.platform('Linux')
+def test_check_window_fully_with_resize_stitch_mode(eyes, driver):
+    eyes.force_full_page_screenshot = True
+    eyes.stitch_mode = StitchMode.Resize
+    eyes.open(driver, "Eyes Selenium SDK - Stitch Modes", "TestCheckWindowFully_Resize",
+              {'width': 800, 'height': 600})
+    driver.get('http://applitools.github.io/demo/TestPages/FramesTestPage/')
+    eyes.check_window("Fully")
+    eyes.close()
+
+
 @pytest.mark.platform('Linux')
 def test_check_window_with_ignore_region_fluent(eyes, driver):
     eyes.force_full_page_screenshot = True
@@ -51,3 +62,14 @@ def test_check_window_with_ignore_region_fluent(eyes, driver):
     eyes.check_window("Fluent - Window with Ignore region", target=Target().ignore(
         Region(left=50, top=50, width=100, height=100)))
     eyes.close()
+
+
+@pytest.mark.platform('Linux')
+def test_check_regions_from_single_screenshot(eyes, driver):
+    driver = eyes.open(driver, "Eyes Selenium SDK - Fluent API", "TestCheckRegions",
+                       {'width': 800, 'height': 600})
+    driver.get('http://applitools.github.io/demo/TestPages/FramesTestPage/')
+    results = eyes.check_regions([Region(50, 50, 100, 100), driver.find_element(By.ID, 'overflowing-div')],
+                                 tags=["Region", "Element"])
+    assert all(result['as_expected'] for result in results)
+    eyes.close()
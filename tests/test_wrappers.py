@@ -0,0 +1,38 @@
+from selenium.webdriver.remote.webelement import WebElement
+
+from applitools.selenium.webelement import EyesWebElement
+
+
+class _CountingParent(object):
+    """
+    Stands in for a driver, recording the commands which would have been sent to the browser.
+    """
+
+    def __init__(self):
+        self.commands = []
+
+    def execute(self, command, params=None):
+        self.commands.append(command)
+        return {'value': None}
+
+
+def test_wrapping_elements_sends_no_commands():
+    parent = _CountingParent()
+    elements = [EyesWebElement(WebElement(parent, str(i)), None, None) for i in range(10000)]
+    assert parent.commands == []
+
+    # Forwarded attributes are read from the wrapped element.
+    assert [element.id for element in elements[:3]] == ['0', '1', '2']
+    assert elements[0].parent is parent
+    assert parent.commands == []
+
+
+def test_find_elements_returns_a_list_of_wrapped_elements():
+    parent = _CountingParent()
+    element = EyesWebElement(WebElement(parent, 'table'), None, None)
+    found = [WebElement(parent, 'row-0'), WebElement(parent, 'row-1')]
+    element._original_methods['find_elements'] = lambda by, value: found
+    rows = element.find_elements('tag name', 'tr')
+    assert isinstance(rows, list)
+    assert all(isinstance(row, EyesWebElement) for row in rows)
+    assert [row.id for row in rows[:]] == ['row-0', 'row-1']